@@ -0,0 +1,26 @@
+import argparse
+from logistics_db import BackfillJob, Database
+
+def main():
+    parser = argparse.ArgumentParser(description="Import older inbox history, resuming from the saved cursor.")
+    parser.add_argument("--days", type=int, default=365, help="How far back to walk the inbox")
+    parser.add_argument("--pages-per-minute", type=float, default=2, help="Page load ceiling")
+    parser.add_argument("--reset", action="store_true", help="Forget the saved cursor and start from the newest page")
+    args = parser.parse_args()
+
+    Database.init()
+    if args.reset: BackfillJob.reset()
+    state = BackfillJob.state()
+    if state["page_url"]: print(f"Resuming at {state['page_url']} (page {state['pages_done'] + 1})")
+
+    def show(s): print(f"Page {s['pages_done']} done · {s['threads_saved']} saved · next: {s['page_url'] or '-'}")
+    try:
+        state = BackfillJob.run(args.days, args.pages_per_minute, on_progress=show)
+    except KeyboardInterrupt:
+        BackfillJob.checkpoint(status="stopped")
+        print("\nStopped. Run again to resume.")
+        return
+    print(f"Backfill {state['status']}: {state['threads_saved']} threads saved over {state['pages_done']} pages.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+import os
+import json
+import time
+import queue
+import shutil
+import signal
+import datetime
+import logging
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger("BrowserKit")
+
+# ==========================================
+# PART 1: REQUEST ROUTING POLICY
+# ==========================================
+class AssetCache:
+    """Static responses kept in memory for one browser, least recently used out first; safe to share across threads.
+
+    Only responses whose Cache-Control allows reuse are kept, and only for as long as max-age says."""
+    MAX_BYTES = 64 * 1024 * 1024
+    # Lifetime for cacheable responses that give no max-age.
+    DEFAULT_TTL = 600
+    NEVER = ("no-store", "no-cache", "private")
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or AssetCache.MAX_BYTES
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def lifetime(headers):
+        """Seconds the response may be reused for; 0 when Cache-Control forbids keeping it."""
+        directives = [d.strip().lower() for d in (headers.get("cache-control") or "").split(",") if d.strip()]
+        if any(d.split("=")[0] in AssetCache.NEVER for d in directives): return 0
+        for d in directives:
+            if d.startswith("max-age="):
+                try: return max(int(d.split("=", 1)[1]), 0)
+                except ValueError: return 0
+        return AssetCache.DEFAULT_TTL
+
+    def get(self, url):
+        """(status, headers, body) while fresh, else None."""
+        with self._lock:
+            item = self._items.get(url)
+            if item is None: return None
+            if item[0] <= time.time():
+                self._drop(url)
+                return None
+            self._items.move_to_end(url)
+            return item[1:]
+
+    def put(self, url, status, headers, body):
+        ttl = AssetCache.lifetime(headers)
+        if not ttl or len(body) > self.max_bytes: return False
+        with self._lock:
+            if url in self._items: self._drop(url)
+            self._items[url] = (time.time() + ttl, status, headers, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes: self._drop(next(iter(self._items)))
+        return True
+
+    def _drop(self, url):
+        self._bytes -= len(self._items.pop(url)[3])
+
+class RoutePolicy:
+    """Aborts sub-resources the scrapers never read and serves repeat static assets from an AssetCache."""
+    # mbasic pages are plain server-rendered HTML; the messenger app needs its scripts and styles to render rows.
+    MBASIC = {"allow": {"document"}, "cache": set()}
+    APP = {"allow": {"document", "script", "stylesheet", "xhr", "fetch"}, "cache": {"script", "stylesheet"}}
+
+    def __init__(self, preset=None, cache=None):
+        """cache: the AssetCache to use, normally the BrowserWorker's; a private one when omitted."""
+        preset = preset or RoutePolicy.MBASIC
+        self.allow, self.cacheable = set(preset["allow"]), set(preset["cache"])
+        self.cache = cache if cache is not None else AssetCache()
+        self.blocked = Counter()
+        self.cache_hits = 0
+        self.bytes_saved = 0
+        self.bytes_fetched = 0
+
+    def install(self, context):
+        context.route("**/*", self._handle)
+        return self
+
+    def _handle(self, route, request):
+        kind = request.resource_type
+        if kind not in self.allow:
+            self.blocked[kind] += 1
+            return route.abort("blockedbyclient")
+        if kind not in self.cacheable or request.method != "GET":
+            return route.continue_()
+
+        hit = self.cache.get(request.url)
+        if hit:
+            status, headers, body = hit
+            self.cache_hits += 1
+            self.bytes_saved += len(body)
+            return route.fulfill(status=status, headers=headers, body=body)
+
+        response = route.fetch()
+        body = response.body()
+        self.bytes_fetched += len(body)
+        if response.ok: self.cache.put(request.url, response.status, response.headers, body)
+        route.fulfill(response=response, body=body)
+
+    def report(self):
+        return {
+            "requests_saved": sum(self.blocked.values()) + self.cache_hits,
+            "blocked": dict(self.blocked),
+            "cache_hits": self.cache_hits,
+            "bytes_saved": self.bytes_saved,
+        }
+
+    def summary(self):
+        r = self.report()
+        kinds = ", ".join(f"{k}={v}" for k, v in sorted(r["blocked"].items())) or "none"
+        return (f"Route filter saved {r['requests_saved']} requests "
+                f"(blocked: {kinds}; cache hits: {r['cache_hits']}, {r['bytes_saved'] / 1024:.0f} KB served from memory)")
+
+# ==========================================
+# PART 2: WARM BROWSER WORKER
+# ==========================================
+class BrowserWorker:
+    """Keeps one Chromium running between jobs in a long-lived process and recycles it before it grows or wedges.
+
+    The sync Playwright API leaves an event loop running in the thread that starts it, after which any
+    `with sync_playwright()` in that thread fails. The warm browser therefore lives on a thread of its own and
+    jobs hand it work through call(); the caller's thread stays free for one-off sessions such as backfill.
+    Memory is the RSS of the driver this worker started and Chromium under it, read from /proc."""
+    MAX_RSS_MB = 1024
+    MAX_PAGES = 200
+    MAX_AGE = 6 * 3600
+    HANG_SECONDS = 180
+    # How long a call may take to unwind after Chromium is killed before the driver goes too.
+    KILL_GRACE = 10
+
+    def __init__(self, headless=True, max_rss_mb=None, max_pages=None, max_age=None, hang_seconds=None):
+        self.headless = headless
+        self.max_rss_mb = max_rss_mb or BrowserWorker.MAX_RSS_MB
+        self.max_pages = max_pages or BrowserWorker.MAX_PAGES
+        self.max_age = max_age or BrowserWorker.MAX_AGE
+        self.hang_seconds = hang_seconds or BrowserWorker.HANG_SECONDS
+        # Outlives browser restarts; scans on this worker share it through RoutePolicy.
+        self.cache = AssetCache()
+        self._pw = self.browser = None
+        self._thread = self._jobs = None
+        self.driver_pids = []
+        self.pages = 0
+        self.launched_at = None
+        self.hung = False
+        self.recycles = Counter()
+
+    @staticmethod
+    def process_tree():
+        """{ppid: [child pids]} for every process visible in /proc; empty where /proc is unavailable."""
+        children = {}
+        try: entries = os.listdir("/proc")
+        except OSError: return children
+        for entry in entries:
+            if not entry.isdigit(): continue
+            try:
+                with open(f"/proc/{entry}/stat") as f: ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError): continue
+            children.setdefault(ppid, []).append(int(entry))
+        return children
+
+    @staticmethod
+    def descendants(root=None, tree=None):
+        """PIDs of every process below root (default: this one)."""
+        tree = BrowserWorker.process_tree() if tree is None else tree
+        found, stack = [], [root or os.getpid()]
+        while stack:
+            for pid in tree.get(stack.pop(), []):
+                found.append(pid)
+                stack.append(pid)
+        return found
+
+    def chromium_pids(self):
+        """Chromium's tree: everything below the driver this worker started, never the rest of the process."""
+        tree = BrowserWorker.process_tree()
+        return [pid for driver in self.driver_pids for pid in BrowserWorker.descendants(driver, tree)]
+
+    def rss_mb(self):
+        page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        total = 0
+        for pid in self.driver_pids + self.chromium_pids():
+            try:
+                with open(f"/proc/{pid}/statm") as f: total += int(f.read().split()[1]) * page
+            except (OSError, IndexError, ValueError): continue
+        return total / (1024 * 1024)
+
+    def recycle_reason(self):
+        if self.browser is None: return None
+        if self.hung: return "hang"
+        if not self.browser.is_connected(): return "crash"
+        if self.pages >= self.max_pages: return "pages"
+        if time.time() - self.launched_at >= self.max_age: return "age"
+        if self.rss_mb() >= self.max_rss_mb: return "rss"
+        return None
+
+    def start(self):
+        from playwright.sync_api import sync_playwright
+        before = set(BrowserWorker.process_tree().get(os.getpid(), []))
+        self._pw = sync_playwright().start()
+        self.driver_pids = [pid for pid in BrowserWorker.process_tree().get(os.getpid(), []) if pid not in before]
+        self.browser = self._pw.chromium.launch(headless=self.headless)
+        self.pages, self.launched_at, self.hung = 0, time.time(), False
+
+    def _close(self):
+        try:
+            if self.browser is not None and not self.hung: self.browser.close()
+            if self._pw is not None: self._pw.stop()
+        except Exception as e:
+            logger.warning(f"Browser did not shut down cleanly: {e}")
+        self._pw = self.browser = None
+        self.driver_pids = []
+
+    def stop(self):
+        """Shuts the browser down on its own thread and ends that thread."""
+        if self._thread is None: return
+        try: self.call(self._close, timeout=30)
+        except TimeoutError: pass
+        if self._jobs is not None: self._jobs.put(None)
+        self._thread = self._jobs = None
+
+    @staticmethod
+    def _signal(pids):
+        for pid in pids:
+            try: os.kill(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError): pass
+
+    def kill(self):
+        """Watchdog action: the call in flight is stuck, so take down Chromium; the driver then fails the call."""
+        self.hung = True
+        pids = self.chromium_pids()
+        logger.error(f"Browser hung for {self.hang_seconds}s; killing {len(pids)} Chromium processes")
+        BrowserWorker._signal(pids)
+
+    def ensure(self):
+        """Returns a warm browser, restarting it first if it crossed a limit. The bool is True on a cold start."""
+        reason = self.recycle_reason()
+        if reason:
+            logger.info(f"Recycling browser ({reason}) after {self.pages} pages, {self.rss_mb():.0f} MB")
+            self.recycles[reason] += 1
+            self._close()
+        cold = self.browser is None
+        if cold: self.start()
+        return self.browser, cold
+
+    def call(self, fn, *args, timeout=None, **kwargs):
+        """Runs fn(*args, **kwargs) on the browser thread and returns its result or raises its exception.
+
+        A call still running after timeout (default hang_seconds) has Chromium killed under it and raises TimeoutError."""
+        if self._thread is None or not self._thread.is_alive():
+            self._jobs = queue.Queue()
+            self._thread = threading.Thread(target=BrowserWorker._serve, args=(self._jobs,), name="browser", daemon=True)
+            self._thread.start()
+        done, box = threading.Event(), {}
+        self._jobs.put((fn, args, kwargs, done, box))
+        timeout = timeout or self.hang_seconds
+        if not done.wait(timeout):
+            self.kill()
+            if not done.wait(BrowserWorker.KILL_GRACE):
+                # The driver itself is wedged: abandon it and its thread; the next call starts both afresh.
+                BrowserWorker._signal(self.driver_pids)
+                self._thread = self._jobs = None
+                self._pw = self.browser = None
+                self.driver_pids = []
+            raise TimeoutError(f"Browser call did not finish within {timeout:.0f}s")
+        if "error" in box: raise box["error"]
+        return box.get("result")
+
+    @staticmethod
+    def _serve(jobs):
+        while True:
+            item = jobs.get()
+            if item is None: return
+            fn, args, kwargs, done, box = item
+            try: box["result"] = fn(*args, **kwargs)
+            except BaseException as e: box["error"] = e
+            finally: done.set()
+
+    @contextmanager
+    def context(self, **options):
+        """A fresh context on the warm browser. Only valid inside a function passed to call()."""
+        browser, _ = self.ensure()
+        context = browser.new_context(**options)
+        context.on("page", lambda _: setattr(self, "pages", self.pages + 1))
+        try:
+            yield context
+        finally:
+            if not self.hung:
+                try: context.close()
+                except Exception: pass
+
+    def stats(self):
+        return {"pages": self.pages, "rss_mb": round(self.rss_mb()), "uptime": round(time.time() - self.launched_at) if self.launched_at else 0,
+                "recycles": dict(self.recycles)}
+
+# ==========================================
+# PART 3: TRACE CAPTURE
+# ==========================================
+class TraceRecorder:
+    """Records a Playwright trace for every run but keeps it only when the run fails or is slower than slow_after.
+
+    Kept runs land in ROOT/<time>_<kind>/ (trace.zip, screenshot.png, timings.json); the oldest are deleted past QUOTA_MB."""
+    ROOT = "traces"
+    QUOTA_MB = 200
+    ENABLED = True
+    # (key, result) of the last kept() scan; see kept().
+    _kept = (None, [])
+
+    def __init__(self, context, kind, slow_after=None):
+        self.context, self.kind, self.slow_after = context, kind, slow_after
+        self.active = False
+
+    def start(self):
+        if TraceRecorder.ENABLED:
+            self.context.tracing.start(screenshots=True, snapshots=True)
+            self.active = True
+        return self
+
+    @contextmanager
+    def watch(self, page, timings):
+        """Runs the block under the trace; timings() is called at the end for the summary that is kept with it."""
+        started = time.perf_counter()
+        error = None
+        try:
+            yield self
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            try: self.finish(page, dict(timings(), elapsed=time.perf_counter() - started), error)
+            except Exception as e: logger.warning(f"Could not save trace: {e}")
+
+    def finish(self, page, timings, error=None):
+        if not self.active: return None
+        self.active = False
+        duration = timings.get("duration") or timings["elapsed"]
+        if error is not None: reason = f"failed: {type(error).__name__}: {error}"
+        elif self.slow_after and duration > self.slow_after: reason = f"slow: {duration:.1f}s > p95 {self.slow_after:.1f}s"
+        else:
+            self.context.tracing.stop()
+            return None
+
+        folder = os.path.join(TraceRecorder.ROOT, f"{datetime.datetime.now():%Y%m%d_%H%M%S}_{self.kind}")
+        os.makedirs(folder, exist_ok=True)
+        self.context.tracing.stop(path=os.path.join(folder, "trace.zip"))
+        try: page.screenshot(path=os.path.join(folder, "screenshot.png"), timeout=5000)
+        except Exception: pass
+        with open(os.path.join(folder, "timings.json"), "w") as f:
+            json.dump(dict(timings, reason=reason), f, indent=2, default=str)
+        logger.info(f"Kept trace in {folder} ({reason})")
+        TraceRecorder.enforce_quota()
+        return folder
+
+    @staticmethod
+    def kept():
+        """Kept traces, newest first: [{path, reason, duration, size}]. Callers must not mutate the list.
+
+        Rescanned only when ROOT or its newest folder changes, i.e. a trace was added, removed or is still being written."""
+        if not os.path.isdir(TraceRecorder.ROOT): return []
+        names = sorted(os.listdir(TraceRecorder.ROOT), reverse=True)
+        try:
+            key = (TraceRecorder.ROOT, os.stat(TraceRecorder.ROOT).st_mtime_ns,
+                   os.stat(os.path.join(TraceRecorder.ROOT, names[0])).st_mtime_ns if names else None)
+        except OSError:
+            key = None
+        if key is not None and TraceRecorder._kept[0] == key: return TraceRecorder._kept[1]
+        found = []
+        for name in names:
+            folder = os.path.join(TraceRecorder.ROOT, name)
+            if not os.path.isdir(folder): continue
+            try:
+                with open(os.path.join(folder, "timings.json")) as f: info = json.load(f)
+            except (OSError, ValueError): info = {}
+            size = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder))
+            found.append({"path": folder, "reason": info.get("reason"), "duration": info.get("duration"), "size": size})
+        TraceRecorder._kept = (key, found)
+        return found
+
+    @staticmethod
+    def enforce_quota():
+        traces = list(TraceRecorder.kept())
+        total = sum(t["size"] for t in traces)
+        # Always keep the newest trace, even if it alone is over quota.
+        while len(traces) > 1 and total > TraceRecorder.QUOTA_MB * 1024 * 1024:
+            oldest = traces.pop()
+            shutil.rmtree(oldest["path"], ignore_errors=True)
+            total -= oldest["size"]
@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+from collections import Counter
+
+# ==========================================
+# VERSIONED QUERY CACHE
+# ==========================================
+class DataCache:
+    """Process-wide cache for dashboard reads, invalidated per table.
+
+    Triggers bump table_versions on every write. A lookup first asks a long-lived connection for
+    PRAGMA data_version, which only moves when another connection commits, so a rerun where nothing
+    changed costs one pragma and no table reads. Module state survives Streamlit reruns."""
+    MAX_ENTRIES = 512
+    _entries = {}
+    _watch = {}
+    _lock = threading.Lock()
+    hits = Counter()
+    misses = Counter()
+
+    @staticmethod
+    def install(db_file, tables):
+        conn = sqlite3.connect(db_file)
+        conn.execute("CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER DEFAULT 0)")
+        for table in tables:
+            conn.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+            for op in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_version_{op.lower()} AFTER {op} ON {table}
+                                 BEGIN UPDATE table_versions SET version = version + 1 WHERE name = '{table}'; END''')
+        conn.commit(); conn.close()
+
+    @staticmethod
+    def versions(db_file):
+        """{table: version}; re-read only when data_version says another connection committed."""
+        with DataCache._lock:
+            watch = DataCache._watch.get(db_file)
+            if watch is None:
+                watch = DataCache._watch[db_file] = [sqlite3.connect(db_file, check_same_thread=False), None, {}]
+            conn, seen, versions = watch
+            current = conn.execute("PRAGMA data_version").fetchone()[0]
+            if current != seen:
+                try: watch[2] = dict(conn.execute("SELECT name, version FROM table_versions"))
+                except sqlite3.OperationalError: watch[2] = {}
+                watch[1] = current
+            return watch[2]
+
+    @staticmethod
+    def get(db_file, tables, key, loader):
+        """loader() result for key, reused until one of tables changes. Callers must not mutate what they get back."""
+        stamp = tuple(DataCache.versions(db_file).get(t) for t in tables)
+        name = key[0] if isinstance(key, tuple) else key
+        if None in stamp:
+            # Table not installed in this database: nothing would ever invalidate the entry.
+            with DataCache._lock: DataCache.misses[name] += 1
+            return loader()
+        with DataCache._lock:
+            entry = DataCache._entries.get((db_file, key))
+            if entry is not None and entry[0] == stamp:
+                DataCache.hits[name] += 1
+                return entry[1]
+            DataCache.misses[name] += 1
+        # Loaded outside the lock so one slow query does not stall other sessions. The stamp is taken
+        # before loading, so a write racing the load only causes one extra miss later.
+        value = loader()
+        with DataCache._lock:
+            DataCache._entries.pop((db_file, key), None)
+            DataCache._entries[(db_file, key)] = (stamp, value)
+            # Paged and searched views add a key per query; drop the least recently stored beyond MAX_ENTRIES.
+            while len(DataCache._entries) > DataCache.MAX_ENTRIES: DataCache._entries.pop(next(iter(DataCache._entries)), None)
+        return value
+
+    @staticmethod
+    def stats():
+        """[{query, hits, misses, hit_rate}] plus a totals row."""
+        rows = []
+        for name in sorted(set(DataCache.hits) | set(DataCache.misses)):
+            h, m = DataCache.hits[name], DataCache.misses[name]
+            rows.append({"query": name, "hits": h, "misses": m, "hit_rate": h / (h + m)})
+        h, m = sum(DataCache.hits.values()), sum(DataCache.misses.values())
+        rows.append({"query": "TOTAL", "hits": h, "misses": m, "hit_rate": h / (h + m) if h + m else 0.0})
+        return rows
@@ -0,0 +1,200 @@
+import io
+import os
+import re
+import json
+import heapq
+import zipfile
+import argparse
+import datetime
+
+import logistics_db
+import logistics_box
+
+# ==========================================
+# PART 1: INCREMENTAL JSON READER
+# ==========================================
+class JsonStream:
+    """Walks one top-level JSON object, yielding array elements of the streamed keys one at a time."""
+    CHUNK = 64 * 1024
+    DECODER = json.JSONDecoder()
+
+    def __init__(self, fp):
+        self.fp, self.buf, self.pos, self.eof = fp, "", 0, False
+
+    def _fill(self):
+        chunk = self.fp.read(JsonStream.CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n": self.pos += 1
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self._fill(): return None
+
+    def _take(self, ch):
+        if self._peek() != ch: raise ValueError(f"expected {ch!r} at offset {self.pos}")
+        self.pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = JsonStream.DECODER.raw_decode(self.buf, self.pos)
+                # A number touching the end of the buffer may continue in the next chunk.
+                if end < len(self.buf) or self.eof or not self._fill():
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if not self._fill(): raise
+
+    def items(self, stream_keys=()):
+        """Yields (key, value); for stream_keys the array is yielded element by element."""
+        self._take("{")
+        while self._peek() not in ("}", None):
+            key = self._value()
+            self._take(":")
+            if key in stream_keys and self._peek() == "[":
+                self._take("[")
+                while self._peek() != "]":
+                    yield key, self._value()
+                    if self._peek() == ",": self.pos += 1
+                self._take("]")
+            else:
+                yield key, self._value()
+            if self._peek() == ",": self.pos += 1
+
+# ==========================================
+# PART 2: EXPORT LAYOUT
+# ==========================================
+class MessageExport:
+    """Reads a folder or .zip from the 'Download Your Information' message export."""
+    FILE = re.compile(r"(?:^|/)messages/(?:inbox|archived_threads|filtered_threads|message_requests|e2ee_cutover)/([^/]+)/message_\d+\.json$")
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+
+    def threads(self):
+        """{thread folder: [message_N.json paths]}, message_1 (newest) first."""
+        if self.zip: names = self.zip.namelist()
+        else: names = [os.path.relpath(os.path.join(d, f), self.path).replace(os.sep, "/")
+                       for d, _, files in os.walk(self.path) for f in files]
+        grouped = {}
+        for name in names:
+            m = MessageExport.FILE.search(name)
+            if m: grouped.setdefault(m.group(1), []).append(name)
+        for files in grouped.values():
+            files.sort(key=lambda n: int(re.search(r"message_(\d+)", n).group(1)))
+        return grouped
+
+    def open(self, name):
+        if self.zip: return io.TextIOWrapper(self.zip.open(name), encoding="utf-8")
+        return open(os.path.join(self.path, name), encoding="utf-8")
+
+    @staticmethod
+    def fix_text(s):
+        """The export writes UTF-8 bytes as \\u00XX escapes; undo that where it applies."""
+        try: return s.encode("latin-1").decode("utf-8")
+        except (UnicodeEncodeError, UnicodeDecodeError): return s
+
+    def participants(self, name):
+        with self.open(name) as f:
+            for key, value in JsonStream(f).items(("messages",)):
+                if key == "participants": return [MessageExport.fix_text(p.get("name", "")) for p in value]
+                if key == "messages": break
+        return []
+
+    def guess_owner(self, sample=25):
+        """The account owner is the one participant every thread has in common."""
+        common = None
+        for files in list(self.threads().values())[:sample]:
+            names = set(self.participants(files[0]))
+            if len(names) < 2: continue
+            common = names if common is None else common & names
+        return next(iter(common)) if common and len(common) == 1 else None
+
+# ==========================================
+# PART 3: IMPORTER
+# ==========================================
+class Importer:
+    KEEP_LINES = 10
+    BATCH_SIZE = 200
+
+    def __init__(self, export, owner=None, schema=None):
+        self.export = export
+        self.owner = owner or export.guess_owner()
+        self.schema = schema or logistics_db.Analyzer.DEFAULT_SCHEMA
+        self.watch_words = logistics_box.Database.watchlist()
+        self.orders, self.leads = [], []
+        self.stats = {"threads": 0, "messages": 0, "orders": 0, "leads": 0}
+
+    def read_thread(self, folder, files):
+        """Streams every message file of one thread; keeps only the newest lines for the order."""
+        newest, participants, title = [], [], None
+        for name in files:
+            with self.export.open(name) as f:
+                for key, value in JsonStream(f).items(("messages",)):
+                    if key == "participants": participants = [MessageExport.fix_text(p.get("name", "")) for p in value]
+                    elif key == "title": title = MessageExport.fix_text(value)
+                    elif key == "messages":
+                        self.stats["messages"] += 1
+                        self.take_message(value, newest)
+        if not newest: return
+        customer = next((p for p in participants if p != self.owner), None) or title or folder
+        newest.sort()
+        ts = datetime.datetime.fromtimestamp(newest[-1][0] / 1000)
+        self.orders.append({"customer": customer, "raw_message": " || ".join(t for _, t in newest),
+                            "date": ts.strftime("%b %d, %Y"), "url": f"dyi:{folder}"})
+
+    def take_message(self, msg, newest):
+        text = MessageExport.fix_text(msg.get("content") or "")
+        sender = MessageExport.fix_text(msg.get("sender_name") or "Unknown")
+        stamp = msg.get("timestamp_ms") or 0
+        if len(text) > 10:
+            item = (stamp, text)
+            if len(newest) < Importer.KEEP_LINES: heapq.heappush(newest, item)
+            elif item > newest[0]: heapq.heapreplace(newest, item)
+        if sender != self.owner and text:
+            word = logistics_box.PassiveScanner.match(text, self.watch_words)
+            if word:
+                when = datetime.datetime.fromtimestamp(stamp / 1000).strftime("%Y-%m-%d %H:%M")
+                self.leads.append((sender, text.replace("\n", " "), word, when))
+        if len(self.leads) >= Importer.BATCH_SIZE: self.flush_leads()
+
+    def flush_orders(self):
+        changed = logistics_db.Database.refresh_orders(self.orders)
+        self.stats["orders"] += logistics_db.Analyzer.analyze_batch(changed, self.schema)
+        self.orders = []
+
+    def flush_leads(self):
+        self.stats["leads"] += logistics_box.Database.save_leads(self.leads)
+        self.leads = []
+
+    def run(self, on_progress=None):
+        for folder, files in self.export.threads().items():
+            self.read_thread(folder, files)
+            self.stats["threads"] += 1
+            if len(self.orders) >= Importer.BATCH_SIZE:
+                self.flush_orders()
+                if on_progress: on_progress(dict(self.stats))
+        self.flush_orders()
+        self.flush_leads()
+        return self.stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a 'Download Your Information' message export without a browser.")
+    parser.add_argument("export", help="Export folder or .zip (JSON format)")
+    parser.add_argument("--owner", help="Your display name in the export (guessed if omitted)")
+    args = parser.parse_args()
+
+    logistics_db.Database.init()
+    logistics_box.Database.init()
+    importer = Importer(MessageExport(args.export), owner=args.owner)
+    print(f"Account owner: {importer.owner or 'unknown'}")
+    stats = importer.run(on_progress=lambda s: print(f"{s['threads']} threads · {s['messages']} messages · {s['orders']} orders · {s['leads']} leads"))
+    print(f"Done: {stats['threads']} threads, {stats['messages']} messages → {stats['orders']} new/updated orders, {stats['leads']} new leads.")
@@ -0,0 +1,204 @@
+import os
+import time
+import sqlite3
+import random
+import argparse
+import tempfile
+import datetime
+import threading
+from html import escape
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import paths
+
+# ==========================================
+# PART 1: SYNTHETIC CONVERSATIONS
+# ==========================================
+class InboxFixture:
+    """Deterministic fake inbox: the same seed always produces the same threads."""
+    FIRST = ["Mike", "Sarah", "Dale", "Tammy", "Ray", "Linda", "Cody", "Brenda", "Travis", "Joy"]
+    LAST = ["T.", "J.", "Hollis", "Pruitt", "Garza", "Nguyen", "Moore", "Baker", "Reyes", "Cole"]
+    ASKS = ["Do you have a full cord of seasoned oak?", "How much for a half cord delivered?",
+            "Need 1 cord of firewood before the freeze", "Is the mixed hardwood dry enough to burn?",
+            "Can you stack it by the garage when you drop it off?", "What do you charge for 1/2 cord of pecan?"]
+    TOWNS = ["Longview", "Tyler", "Marshall", "Kilgore", "Gladewater"]
+    STREETS = ["Main St", "Oak Ave", "Pine Rd", "Spur Dr", "Loop Hwy", "Cedar Ln", "Judson Blvd"]
+    REPLIES = ["Yes sir, we have plenty stacked right now", "Delivery is free inside the loop",
+               "I can bring it out Saturday morning", "Cash or card is fine either way"]
+
+    def __init__(self, threads=200, per_page=10, span_days=30, seed=0):
+        self.count, self.per_page, self.seed = threads, per_page, seed
+        self.span_minutes = span_days * 24 * 60
+        self.now = datetime.datetime.now()
+
+    def name(self, tid):
+        rng = random.Random(self.seed * 1_000_003 + tid)
+        return f"{rng.choice(InboxFixture.FIRST)} {rng.choice(InboxFixture.LAST)}"
+
+    def age_minutes(self, tid):
+        return int(5 + tid * self.span_minutes / max(self.count, 1))
+
+    def stamp(self, tid):
+        """Formats the thread age the way the mbasic inbox does."""
+        minutes = self.age_minutes(tid)
+        if minutes < 60: return f"{minutes} min"
+        if minutes < 24 * 60: return f"{minutes // 60} hrs"
+        if minutes < 48 * 60: return "Yesterday"
+        return (self.now - datetime.timedelta(minutes=minutes)).strftime("%b %d")
+
+    def messages(self, tid):
+        rng = random.Random(self.seed * 7_919 + tid)
+        lines = []
+        for _ in range(rng.randint(3, 14)):
+            lines.append(rng.choice(InboxFixture.ASKS))
+            if rng.random() < 0.4:
+                lines.append(f"I'm at {rng.randint(100, 9999)} {rng.choice(InboxFixture.STREETS)} in {rng.choice(InboxFixture.TOWNS)}")
+            lines.append(rng.choice(InboxFixture.REPLIES))
+        return lines
+
+    def unread(self, tid):
+        return random.Random(self.seed + tid * 31).random() < 0.2
+
+    # ---- pages ----
+    def inbox_page(self, page_no):
+        start = page_no * self.per_page
+        rows = []
+        for tid in range(start, min(start + self.per_page, self.count)):
+            weight = "strong" if self.unread(tid) else "span"
+            rows.append(f'<tr><td><a href="/messages/read/?tid={tid}"><h3><{weight}>{escape(self.name(tid))}</{weight}></h3></a>'
+                        f'<span>{escape(self.messages(tid)[-1])}</span></td><td><abbr>{self.stamp(tid)}</abbr></td></tr>')
+        older = ""
+        if start + self.per_page < self.count:
+            older = f'<div id="see_older_threads"><a href="/messages/?page={page_no + 1}">See Older Messages</a></div>'
+        return (f'<html><head><title>Messages</title><link rel="stylesheet" href="/static/site.css"></head><body>'
+                f'<div id="root"><img src="/static/logo.png"><table>{"".join(rows)}</table>{older}</div></body></html>')
+
+    def thread_page(self, tid):
+        body = "".join(f"<div><span>{escape(line)}</span></div>" for line in self.messages(tid))
+        return (f'<html><head><title>{escape(self.name(tid))}</title><link rel="stylesheet" href="/static/site.css"></head>'
+                f'<body><div id="root"><h3>{escape(self.name(tid))}</h3><img src="/static/avatar.png">{body}</div></body></html>')
+
+    def chat_list(self, limit=50):
+        rows = "".join(f'<div role="row"><div>{escape(self.name(tid))}</div><div>{escape(self.messages(tid)[-2])}</div>'
+                       f'<img src="/static/avatar.png"></div>' for tid in range(min(limit, self.count)))
+        return (f'<html><head><script src="/static/app.js"></script><link rel="stylesheet" href="/static/site.css"></head>'
+                f'<body><div role="grid">{rows}</div></body></html>')
+
+# ==========================================
+# PART 2: HTTP SERVER
+# ==========================================
+class FixtureServer:
+    STATIC = {".css": ("text/css", b"body{font-family:sans-serif}" * 400),
+              ".js": ("application/javascript", b"window.__fixture=1;" * 2000),
+              ".png": ("image/png", b"\x89PNG\r\n\x1a\n" + b"\x00" * 40_000)}
+
+    def __init__(self, fixture, port=0, latency=0.0):
+        self.fixture, self.latency = fixture, latency
+        self.hits = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass
+
+            def do_GET(self):
+                server.hits += 1
+                if server.latency: time.sleep(server.latency)
+                url = urlparse(self.path)
+                q = parse_qs(url.query)
+                ext = os.path.splitext(url.path)[1]
+                if url.path.startswith("/static/") and ext in FixtureServer.STATIC:
+                    kind, body = FixtureServer.STATIC[ext]
+                    return self.reply(200, kind, body)
+                if url.path == "/messages/t/":
+                    return self.reply(200, "text/html", server.fixture.chat_list().encode())
+                if url.path == "/messages/read/":
+                    tid = int(q.get("tid", ["-1"])[0])
+                    if 0 <= tid < server.fixture.count:
+                        return self.reply(200, "text/html", server.fixture.thread_page(tid).encode())
+                if url.path == "/messages/":
+                    return self.reply(200, "text/html", server.fixture.inbox_page(int(q.get("page", ["0"])[0])).encode())
+                self.reply(404, "text/plain", b"not found")
+
+            def reply(self, status, kind, body):
+                self.send_response(status)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="FixtureServer", daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# ==========================================
+# PART 3: OFFLINE BENCHMARK
+# ==========================================
+def point_scrapers_at(base_url, workdir):
+    """Redirects both scrapers, their databases and artifact directories at the fixture so nothing real is touched."""
+    logistics_db, logistics_box = paths.relocate(workdir)
+    logistics_db.InboxIndexer.BASE_URL = base_url
+    logistics_db.ScraperBot.AUTH_FILE = None
+    logistics_db.ScraperBot.HEADLESS = True
+    logistics_box.PassiveScanner.BASE_URL = base_url
+    logistics_box.PassiveScanner.AUTH_FILE = None
+    return logistics_db, logistics_box
+
+def bench(threads=200, per_page=10, latency=0.0):
+    fixture = InboxFixture(threads=threads, per_page=per_page)
+    server = FixtureServer(fixture, latency=latency)
+    base = server.start()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            logistics_db, logistics_box = point_scrapers_at(base, workdir)
+            logistics_db.Database.init()
+            logistics_box.Database.init()
+
+            t0 = time.perf_counter()
+            targets = logistics_db.InboxIndexer.build_target_list(threads, 3650)
+            results["index"] = (len(targets), time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            details = logistics_db.SafeWorker.fetch_details(targets)
+            results["fetch"] = (len(details), time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            stats = logistics_db.ScraperBot.run(threads, 3650, budget=logistics_db.ScanBudget())
+            results["pipeline"] = (stats["saved"], time.perf_counter() - t0)
+
+            conn = sqlite3.connect(logistics_box.Database.DB_FILE)
+            conn.executemany("INSERT OR IGNORE INTO watchlist (word) VALUES (?)", [("cord",), ("firewood",)])
+            conn.commit(); conn.close()
+            t0 = time.perf_counter()
+            leads = logistics_box.PassiveScanner.run_scan()
+            results["scan"] = (leads, time.perf_counter() - t0)
+    finally:
+        server.stop()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the inbox, thread and chat-list pages.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("serve", "bench"):
+        sp = sub.add_parser(name)
+        sp.add_argument("--threads", type=int, default=200)
+        sp.add_argument("--per-page", type=int, default=10)
+        sp.add_argument("--latency", type=float, default=0.0, help="Seconds of artificial delay per request")
+    sub.choices["serve"].add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        server = FixtureServer(InboxFixture(args.threads, args.per_page), port=args.port, latency=args.latency)
+        print(f"Serving {args.threads} synthetic threads at {server.base_url}/messages/ (Ctrl+C to stop)")
+        try: server.httpd.serve_forever()
+        except KeyboardInterrupt: server.stop()
+    else:
+        for stage, (n, secs) in bench(args.threads, args.per_page, args.latency).items():
+            print(f"{stage:<9} {n:>6} items  {secs:7.2f}s  {n / secs if secs else 0:8.1f}/s")
@@ -0,0 +1,181 @@
+import os
+import json
+import socket
+import sqlite3
+import datetime
+import paths
+from data_cache import DataCache
+
+# ==========================================
+# PERSISTENT JOB QUEUE
+# ==========================================
+class JobQueue:
+    """SQLite-backed queue shared by the dashboards (which enqueue) and scan_worker.py (which runs jobs)."""
+    DB_FILE = paths.DEEP_DB
+    KINDS = ("scan", "backfill", "reprice", "export")
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 30
+    COLUMNS = ["id", "kind", "params", "status", "attempts", "worker", "created_at", "started_at", "finished_at",
+               "duration", "result", "error", "run_after", "progress_done", "progress_total", "cancel_requested"]
+
+    @staticmethod
+    def connect():
+        return sqlite3.connect(JobQueue.DB_FILE, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def init():
+        conn = JobQueue.connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         kind TEXT, params JSON, status TEXT,
+                         attempts INTEGER DEFAULT 0, worker TEXT,
+                         created_at TEXT, started_at TEXT, finished_at TEXT,
+                         duration REAL, result JSON, error TEXT,
+                         run_after TEXT)''')
+        for col in ("progress_done INTEGER", "progress_total INTEGER", "cancel_requested INTEGER DEFAULT 0"):
+            try: conn.execute(f"ALTER TABLE jobs ADD COLUMN {col}")
+            except sqlite3.OperationalError: pass
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+        conn.close()
+        # Dashboards read job rows through DataCache; these triggers tell it when they change.
+        DataCache.install(JobQueue.DB_FILE, ("jobs",))
+
+    @staticmethod
+    def now():
+        return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def worker_id():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @staticmethod
+    def enqueue(kind, params=None, dedupe=False):
+        """Adds a job; with dedupe, returns the id of an unfinished job of the same kind instead."""
+        if kind not in JobQueue.KINDS: raise ValueError(f"unknown job kind: {kind}")
+        conn = JobQueue.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if dedupe:
+                row = conn.execute("SELECT id FROM jobs WHERE kind=? AND status IN ('queued', 'running') ORDER BY id LIMIT 1", (kind,)).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return row[0]
+            c = conn.execute("INSERT INTO jobs (kind, params, status, created_at) VALUES (?, ?, 'queued', ?)",
+                             (kind, json.dumps(params or {}), JobQueue.now()))
+            conn.execute("COMMIT")
+            return c.lastrowid
+        finally:
+            conn.close()
+
+    @staticmethod
+    def claim(worker, kinds=None):
+        """Atomically moves the oldest queued job to running and returns it, or None."""
+        kinds = kinds or JobQueue.KINDS
+        conn = JobQueue.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(f"""SELECT id FROM jobs WHERE status='queued' AND kind IN ({','.join('?' * len(kinds))})
+                                   AND (run_after IS NULL OR run_after <= ?) ORDER BY id LIMIT 1""",
+                               [*kinds, JobQueue.now()]).fetchone()
+            if not row:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE jobs SET status='running', worker=?, started_at=?, attempts=attempts+1 WHERE id=?",
+                         (worker, JobQueue.now(), row[0]))
+            job = conn.execute("SELECT * FROM jobs WHERE id=?", (row[0],)).fetchone()
+            conn.execute("COMMIT")
+            return JobQueue._row(job)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def finish(job_id, result, duration, status="done"):
+        conn = JobQueue.connect()
+        conn.execute("UPDATE jobs SET status=?, finished_at=?, duration=?, result=?, error=NULL WHERE id=?",
+                     (status, JobQueue.now(), duration, json.dumps(result), job_id))
+        conn.close()
+
+    @staticmethod
+    def progress(job_id, done, total):
+        conn = JobQueue.connect()
+        conn.execute("UPDATE jobs SET progress_done=?, progress_total=? WHERE id=?", (done, total, job_id))
+        conn.close()
+
+    @staticmethod
+    def request_cancel(job_id):
+        """A queued job is cancelled outright; a running one is flagged and stops at its next check."""
+        conn = JobQueue.connect()
+        conn.execute("UPDATE jobs SET status='cancelled', finished_at=? WHERE id=? AND status='queued'", (JobQueue.now(), job_id))
+        conn.execute("UPDATE jobs SET cancel_requested=1 WHERE id=? AND status='running'", (job_id,))
+        conn.close()
+
+    @staticmethod
+    def cancel_requested(job_id):
+        conn = JobQueue.connect()
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE id=?", (job_id,)).fetchone()
+        conn.close()
+        return bool(row and row[0])
+
+    @staticmethod
+    def fail(job_id, error, duration):
+        """Requeues the job with a growing delay until it has used MAX_ATTEMPTS, then marks it failed."""
+        conn = JobQueue.connect()
+        attempts = conn.execute("SELECT attempts FROM jobs WHERE id=?", (job_id,)).fetchone()[0]
+        retry_at = (datetime.datetime.now() + datetime.timedelta(seconds=JobQueue.RETRY_DELAY * attempts)).strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute('''UPDATE jobs SET status=CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+                        finished_at=?, duration=?, error=?, run_after=? WHERE id=?''',
+                     (JobQueue.MAX_ATTEMPTS, JobQueue.now(), duration, error, retry_at, job_id))
+        conn.close()
+
+    @staticmethod
+    def recover(worker_host=None):
+        """Requeues jobs left 'running' by workers on this host that no longer exist."""
+        host = worker_host or socket.gethostname()
+        conn = JobQueue.connect()
+        recovered = 0
+        for job_id, worker in conn.execute("SELECT id, worker FROM jobs WHERE status='running'").fetchall():
+            w_host, _, pid = (worker or "").rpartition(":")
+            if w_host != host or not pid.isdigit(): continue
+            try: os.kill(int(pid), 0)
+            except ProcessLookupError:
+                conn.execute("UPDATE jobs SET status='queued', error='worker died' WHERE id=?", (job_id,))
+                recovered += 1
+            except PermissionError: pass
+        conn.close()
+        return recovered
+
+    @staticmethod
+    def get(job_id):
+        conn = JobQueue.connect()
+        row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        conn.close()
+        return JobQueue._row(row) if row else None
+
+    @staticmethod
+    def latest(kind):
+        conn = JobQueue.connect()
+        row = conn.execute("SELECT * FROM jobs WHERE kind=? ORDER BY id DESC LIMIT 1", (kind,)).fetchone()
+        conn.close()
+        return JobQueue._row(row) if row else None
+
+    @staticmethod
+    def recent(limit=20):
+        conn = JobQueue.connect()
+        rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        conn.close()
+        return [JobQueue._row(r) for r in rows]
+
+    @staticmethod
+    def oldest_waiting():
+        """created_at of the oldest queued job, used to warn when no worker is running."""
+        conn = JobQueue.connect()
+        row = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status='queued'").fetchone()
+        conn.close()
+        return row[0]
+
+    @staticmethod
+    def _row(row):
+        job = dict(zip(JobQueue.COLUMNS, row))
+        job["params"] = json.loads(job["params"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
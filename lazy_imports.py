@@ -0,0 +1,30 @@
+import sys
+import functools
+import importlib.util
+
+# ==========================================
+# DEFERRED IMPORTS
+# ==========================================
+def lazy(name):
+    """The module `name`, executed on first attribute access rather than at import time.
+
+    Workers and CLI scripts import the dashboard modules for their classes only; this keeps
+    Streamlit and pandas out of those processes unless something actually uses them."""
+    if name in sys.modules: return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None: raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def fragment(run_every=None):
+    """@st.fragment(run_every=...) without touching Streamlit until the panel is first drawn."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def draw(*args, **kwargs):
+            import streamlit as st
+            return st.fragment(fn, run_every=run_every)(*args, **kwargs)
+        return draw
+    return wrap
@@ -1,5 +1,3 @@
-import streamlit as st
-import pandas as pd
 import sqlite3
 import time
 import json
@@ -10,7 +8,19 @@ import sys
 import os
 import datetime
 import subprocess
-from playwright.sync_api import sync_playwright
+import atexit
+from contextlib import contextmanager, ExitStack
+import paths
+from lazy_imports import lazy, fragment
+from browser_kit import RoutePolicy, TraceRecorder
+from page_archive import PageArchive, Extractors
+from job_queue import JobQueue
+from run_history import RunHistory, RunTimer, ScanBudget
+from data_cache import DataCache
+from snapshot import Snapshot
+
+st = lazy("streamlit")
+pd = lazy("pandas")
 
 # ==========================================
 # PART 0: SYSTEM LOGGING & STYLING
@@ -41,7 +51,11 @@ def setup_style():
 # PART 1: PERSISTENT DATABASE ENGINE
 # ==========================================
 class Database:
-    DB_FILE = "logistics_deep.db"
+    DB_FILE = paths.DEEP_DB
+    CACHED_TABLES = ("deep_logs", "watchlist", "macros", "system_state", "jobs", "scan_runs", "scheduler_lease")
+    PAGE_ROWS = 200
+    # Rollup grain -> (table, length of the scanned_at prefix that names the bucket).
+    ROLLUPS = {"hour": ("lead_rollup_hourly", 13), "day": ("lead_rollup_daily", 10)}
 
     @staticmethod
     def init():
@@ -58,8 +72,117 @@ class Database:
         c.execute('''CREATE TABLE IF NOT EXISTS system_state 
                      (id INTEGER PRIMARY KEY, autopilot_active INTEGER, interval TEXT)''')
         c.execute("INSERT OR IGNORE INTO system_state (id, autopilot_active, interval) VALUES (1, 0, '1 hour')")
+        for col in ("next_run_at TEXT", "last_run_at REAL",
+                    "adaptive_seconds REAL", "adaptive_min REAL DEFAULT 300", "adaptive_max REAL DEFAULT 14400"):
+            try: c.execute(f"ALTER TABLE system_state ADD COLUMN {col}")
+            except sqlite3.OperationalError: pass
+        c.execute('''CREATE TABLE IF NOT EXISTS scheduler_lease
+                     (id INTEGER PRIMARY KEY, holder TEXT, acquired_at TEXT, heartbeat_at REAL)''')
+        c.execute("INSERT OR IGNORE INTO scheduler_lease (id) VALUES (1)")
+        c.execute("CREATE INDEX IF NOT EXISTS deep_logs_keyword ON deep_logs (keyword_found, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS deep_logs_scanned ON deep_logs (scanned_at)")
+        # Row count kept by triggers so the Database tab never has to COUNT(*) the whole history.
+        c.execute("CREATE TABLE IF NOT EXISTS row_counts (name TEXT PRIMARY KEY, rows INTEGER)")
+        # Seeded once; the SELECT would count the whole table on every init even when the insert is ignored.
+        if not c.execute("SELECT 1 FROM row_counts WHERE name = 'deep_logs'").fetchone():
+            c.execute("INSERT INTO row_counts (name, rows) SELECT 'deep_logs', COUNT(*) FROM deep_logs")
+        c.execute("""CREATE TRIGGER IF NOT EXISTS deep_logs_count_insert AFTER INSERT ON deep_logs
+                     BEGIN UPDATE row_counts SET rows = rows + 1 WHERE name = 'deep_logs'; END""")
+        c.execute("""CREATE TRIGGER IF NOT EXISTS deep_logs_count_delete AFTER DELETE ON deep_logs
+                     BEGIN UPDATE row_counts SET rows = rows - 1 WHERE name = 'deep_logs'; END""")
+        # Leads per keyword per hour/day, kept current by triggers so charts never scan deep_logs.
+        for table, width in Database.ROLLUPS.values():
+            fresh = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+            c.execute(f"CREATE TABLE IF NOT EXISTS {table} (bucket TEXT, keyword TEXT, leads INTEGER, PRIMARY KEY (bucket, keyword))")
+            if fresh:
+                c.execute(f"""INSERT INTO {table} (bucket, keyword, leads)
+                              SELECT substr(scanned_at, 1, {width}), keyword_found, COUNT(*) FROM deep_logs GROUP BY 1, 2""")
+            c.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON deep_logs BEGIN
+                            INSERT INTO {table} (bucket, keyword, leads) VALUES (substr(NEW.scanned_at, 1, {width}), NEW.keyword_found, 1)
+                            ON CONFLICT (bucket, keyword) DO UPDATE SET leads = leads + 1; END""")
+            c.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON deep_logs BEGIN
+                            UPDATE {table} SET leads = leads - 1 WHERE bucket = substr(OLD.scanned_at, 1, {width}) AND keyword IS OLD.keyword_found; END""")
         conn.commit()
         conn.close()
+        JobQueue.init()
+        RunHistory.init()
+        DataCache.install(Database.DB_FILE, Database.CACHED_TABLES)
+
+    @staticmethod
+    def cached(tables, key, loader):
+        return DataCache.get(Database.DB_FILE, tables, key, loader)
+
+    @staticmethod
+    def read_df(sql):
+        conn = sqlite3.connect(Database.DB_FILE)
+        df = pd.read_sql(sql, conn)
+        conn.close()
+        return df
+
+    @staticmethod
+    def save_leads(leads):
+        """leads: (user_profile, raw_message, keyword_found, scanned_at). Skips ones already logged; one transaction."""
+        inserted = 0
+        conn = sqlite3.connect(Database.DB_FILE)
+        with conn:
+            for user_name, message, word, scanned_at in leads:
+                exists = conn.execute("SELECT 1 FROM deep_logs WHERE user_profile=? AND raw_message=?", (user_name, message)).fetchone()
+                if not exists:
+                    conn.execute("INSERT INTO deep_logs (user_profile, raw_message, keyword_found, scanned_at) VALUES (?, ?, ?, ?)",
+                                 (user_name, message, word, scanned_at))
+                    inserted += 1
+        conn.close()
+        return inserted
+
+    @staticmethod
+    def lead_count():
+        conn = sqlite3.connect(Database.DB_FILE)
+        rows = conn.execute("SELECT rows FROM row_counts WHERE name='deep_logs'").fetchone()[0]
+        conn.close()
+        return rows
+
+    @staticmethod
+    def lead_keywords():
+        """Keywords with at least one lead, read from the daily rollup (days x keywords) rather than the whole history."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        words = [w for (w,) in conn.execute(f"SELECT DISTINCT keyword FROM {Database.ROLLUPS['day'][0]} WHERE leads > 0 ORDER BY keyword")]
+        conn.close()
+        return words
+
+    @staticmethod
+    def page_leads(before_id=None, keyword=None, profile="", search="", since=None, until=None, limit=None):
+        """Newest-first keyset page: rows with id below before_id that pass the filters. Reads limit + 1 to tell if more exist."""
+        where, args = [], []
+        if before_id is not None: where.append("id < ?"); args.append(before_id)
+        if keyword: where.append("keyword_found = ?"); args.append(keyword)
+        if profile: where.append("user_profile LIKE ?"); args.append(f"%{profile}%")
+        if search: where.append("raw_message LIKE ?"); args.append(f"%{search}%")
+        if since: where.append("scanned_at >= ?"); args.append(str(since))
+        if until: where.append("scanned_at < ?"); args.append(str(until + datetime.timedelta(days=1)))
+        sql = "SELECT * FROM deep_logs" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id DESC LIMIT ?"
+        conn = sqlite3.connect(Database.DB_FILE)
+        df = pd.read_sql(sql, conn, params=[*args, (limit or Database.PAGE_ROWS) + 1])
+        conn.close()
+        return df
+
+    @staticmethod
+    def lead_rollup(grain="hour", since=None, until=None):
+        """Leads per (bucket, keyword) at the given grain; since/until are datetimes and bound the buckets."""
+        table, width = Database.ROLLUPS[grain]
+        where, args = ["leads > 0"], []
+        if since: where.append("bucket >= ?"); args.append(since.strftime("%Y-%m-%d %H:%M")[:width])
+        if until: where.append("bucket <= ?"); args.append(until.strftime("%Y-%m-%d %H:%M")[:width])
+        conn = sqlite3.connect(Database.DB_FILE)
+        df = pd.read_sql(f"SELECT bucket, keyword, leads FROM {table} WHERE {' AND '.join(where)} ORDER BY bucket", conn, params=args)
+        conn.close()
+        return df
+
+    @staticmethod
+    def watchlist():
+        conn = sqlite3.connect(Database.DB_FILE)
+        words = [w for (w,) in conn.execute("SELECT word FROM watchlist")]
+        conn.close()
+        return words
 
 # ==========================================
 # PART 2: AUTOMATED LOGIN & MACRO TOOLS
@@ -68,6 +191,7 @@ class AutomationTools:
     @staticmethod
     def run_auto_login():
         """Opens a browser for the user to log in and saves the state automatically."""
+        from playwright.sync_api import sync_playwright
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=False) 
             context = browser.new_context()
@@ -89,6 +213,7 @@ class AutomationTools:
     def record_macro(name):
         """Records clicks and keys to create a reusable automation script."""
         steps = []
+        from playwright.sync_api import sync_playwright
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=False)
             context = browser.new_context(storage_state="fb_auth.json" if os.path.exists("fb_auth.json") else None)
@@ -123,67 +248,386 @@ class AutomationTools:
 # PART 3: THE PASSIVE SCRAPER
 # ==========================================
 class PassiveScanner:
+    BASE_URL = "https://www.facebook.com"
+    AUTH_FILE = "fb_auth.json"
+
+    @staticmethod
+    def match(text, watch_words):
+        for word in watch_words:
+            if re.search(re.escape(word), text, re.IGNORECASE): return word
+        return None
+
+    @staticmethod
+    def find_leads(texts, watch_words, scanned_at=None):
+        now = scanned_at or datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+        leads = []
+        for raw_text in texts:
+            word = PassiveScanner.match(raw_text, watch_words)
+            if word:
+                lines = raw_text.split('\n')
+                leads.append((lines[0] if lines else "Unknown", raw_text.replace('\n', ' '), word, now))
+        return leads
+
+    @staticmethod
+    def log_matches(texts, watch_words, scanned_at=None):
+        """Stores each chat row that mentions a watch word, dated scanned_at (default: now); returns how many were new."""
+        return Database.save_leads(PassiveScanner.find_leads(texts, watch_words, scanned_at))
+
     @staticmethod
-    def run_scan():
+    @contextmanager
+    def open_context(browser=None):
+        """A logged-in context on the caller's warm BrowserWorker, or on a one-off Chromium when there is none."""
+        if browser is not None:
+            with browser.context(storage_state=PassiveScanner.AUTH_FILE) as context: yield context
+            return
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:
+            one_off = p.chromium.launch(headless=True)
+            try: yield one_off.new_context(storage_state=PassiveScanner.AUTH_FILE)
+            finally: one_off.close()
+
+    @staticmethod
+    def run_scan(budget=None, browser=None):
+        """One pass over the chat list; the budget bounds every wait so runs never overlap.
+
+        scan_worker.py passes its BrowserWorker (and calls this through BrowserWorker.call) so Chromium stays warm between scans."""
         Database.init()
-        conn = sqlite3.connect(Database.DB_FILE)
-        watch_words = pd.read_sql("SELECT word FROM watchlist", conn)['word'].tolist()
-        conn.close()
+        watch_words = Database.watchlist()
 
-        if not watch_words: return
+        # None rather than 0: nothing was scanned, which must not read as a quiet inbox.
+        if not watch_words: return None
+        auth = PassiveScanner.AUTH_FILE
+        if auth and not os.path.exists(auth): return None
 
+        timer = RunTimer("passive")
+        budget = budget or ScanBudget()
+        inserted = 0
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True) 
-                if not os.path.exists("fb_auth.json"): return
-                
-                context = browser.new_context(storage_state="fb_auth.json")
-                page = context.new_page()
-                page.goto("https://www.facebook.com/messages/t/", timeout=60000)
-                page.wait_for_selector("div[role='grid']", timeout=30000)
-                chats = page.locator("div[role='row']").all()
-                
-                for chat in chats:
-                    raw_text = chat.inner_text()
-                    for word in watch_words:
-                        if re.search(re.escape(word), raw_text, re.IGNORECASE):
-                            lines = raw_text.split('\n')
-                            user_name = lines[0] if lines else "Unknown"
-                            conn = sqlite3.connect(Database.DB_FILE)
-                            exists = conn.execute("SELECT 1 FROM deep_logs WHERE user_profile=? AND raw_message=?", (user_name, raw_text)).fetchone()
-                            if not exists:
-                                conn.execute("INSERT INTO deep_logs (user_profile, raw_message, keyword_found, scanned_at) VALUES (?, ?, ?, ?)",
-                                             (user_name, raw_text.replace('\n', ' '), word, datetime.datetime.now().strftime("%Y-%m-%d %H:%M")))
-                                conn.commit()
-                            conn.close()
-                            break 
-                browser.close()
-        except Exception as e: logger.error(f"Scraper Error: {e}")
+            with ExitStack() as stack:
+                with timer.stage("launch"):
+                    context = stack.enter_context(PassiveScanner.open_context(browser))
+                    policy = RoutePolicy(RoutePolicy.APP, browser.cache if browser else None).install(context)
+                    trace = TraceRecorder(context, "passive", RunHistory.percentiles("passive")[95]).start()
+                    page = context.new_page()
+                with trace.watch(page, timer.row):
+                    with timer.stage("nav"):
+                        budget.take_page()
+                        page.goto(PassiveScanner.BASE_URL + "/messages/t/", timeout=budget.timeout_ms(60000))
+                        page.wait_for_selector("div[role='grid']", timeout=budget.timeout_ms(30000))
+                    with timer.stage("extract"):
+                        html = page.content()
+                        PageArchive.store(page.url, html, "chatlist")
+                        texts = Extractors.chat_rows(html)
+                    with timer.stage("match"):
+                        leads = PassiveScanner.find_leads(texts, watch_words)
+                        inserted = Database.save_leads(leads)
+                    timer.count(rows_seen=len(texts), matches=len(leads), inserts=inserted)
+            logger.info(policy.summary())
+        except Exception as e:
+            # Re-raised so the job is recorded as failed rather than as a scan that found nothing.
+            timer.fail(e)
+            logger.error(f"Scraper Error: {e}")
+            raise
+        finally:
+            timer.save()
+        return inserted
 
 # ==========================================
 # PART 4: SCHEDULER & UI
 # ==========================================
+class SchedulerLease:
+    """A single heartbeat row in SQLite; only the instance holding it runs the schedule."""
+    TTL = 90
+    HEARTBEAT = 30
+
+    @staticmethod
+    def holder_id():
+        return JobQueue.worker_id()
+
+    @staticmethod
+    def acquire(holder):
+        """Takes the lease if it is free, already ours, or its holder has stopped heart-beating."""
+        conn = sqlite3.connect(Database.DB_FILE, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            current, beat = conn.execute("SELECT holder, heartbeat_at FROM scheduler_lease WHERE id=1").fetchone()
+            now = time.time()
+            if current == holder:
+                conn.execute("UPDATE scheduler_lease SET heartbeat_at=? WHERE id=1", (now,))
+            elif current is None or beat is None or now - beat > SchedulerLease.TTL:
+                conn.execute("UPDATE scheduler_lease SET holder=?, acquired_at=?, heartbeat_at=? WHERE id=1",
+                             (holder, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), now))
+                if current: logger.info(f"Scheduler lease taken over from stale holder {current}")
+            else:
+                conn.execute("COMMIT")
+                return False
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    @staticmethod
+    def release(holder):
+        conn = sqlite3.connect(Database.DB_FILE, timeout=30)
+        conn.execute("UPDATE scheduler_lease SET holder=NULL, heartbeat_at=NULL WHERE id=1 AND holder=?", (holder,))
+        conn.commit(); conn.close()
+
+    @staticmethod
+    def row():
+        conn = sqlite3.connect(Database.DB_FILE)
+        row = conn.execute("SELECT holder, acquired_at, heartbeat_at FROM scheduler_lease WHERE id=1").fetchone()
+        conn.close()
+        return row
+
+    @staticmethod
+    def status(row=None):
+        """Lease health from row (default: read now). The heartbeat age is always taken against the current time."""
+        holder, acquired_at, beat = row or SchedulerLease.row()
+        age = time.time() - beat if beat else None
+        return {"holder": holder, "acquired_at": acquired_at, "heartbeat_age": age,
+                "stale": holder is not None and (age is None or age > SchedulerLease.TTL),
+                "mine": holder == SchedulerLease.holder_id()}
+
+class AdaptiveInterval:
+    """Learns the 'Adaptive' interval from each scan: tighten while leads arrive, back off while nothing changes."""
+    BACKOFF = 1.5
+    # Never schedule scans closer together than this many times the last run's duration.
+    MIN_DUTY = 3
+
+    @staticmethod
+    def current():
+        conn = sqlite3.connect(Database.DB_FILE)
+        seconds, lo, hi = conn.execute("SELECT adaptive_seconds, adaptive_min, adaptive_max FROM system_state WHERE id=1").fetchone()
+        conn.close()
+        return seconds or hi, lo, hi
+
+    @staticmethod
+    def record(new_leads, duration):
+        seconds, lo, hi = AdaptiveInterval.current()
+        if new_leads > 0: seconds /= 1 + 0.5 * min(new_leads, 4)
+        else: seconds *= AdaptiveInterval.BACKOFF
+        seconds = min(max(seconds, lo, duration * AdaptiveInterval.MIN_DUTY), hi)
+        conn = sqlite3.connect(Database.DB_FILE)
+        conn.execute("UPDATE system_state SET adaptive_seconds=? WHERE id=1", (seconds,))
+        conn.commit(); conn.close()
+        logger.info(f"Adaptive interval now {seconds / 60:.1f} min ({new_leads} new leads, scan took {duration:.0f}s)")
+        return seconds
+
+    @staticmethod
+    def set_limits(lo, hi):
+        """Saves new bounds and pulls the learned interval inside them, so the next scan is already in range."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        conn.execute("UPDATE system_state SET adaptive_min=?, adaptive_max=?, adaptive_seconds=MIN(MAX(adaptive_seconds, ?), ?) WHERE id=1",
+                     (lo, hi, lo, hi))
+        conn.commit(); conn.close()
+
 class Scheduler:
-    INTERVAL_MAP = {"2 min": 120, "5 min": 300, "10 min": 600, "30 min": 1800, "1 hour": 3600, "2 hours": 7200, "28 hours": 100800}
+    INTERVAL_MAP = {"2 min": 120, "5 min": 300, "10 min": 600, "30 min": 1800, "1 hour": 3600, "2 hours": 7200, "28 hours": 100800,
+                    "Adaptive": None}
+    # Longest the loop sleeps between schedule checks when nothing changes.
+    WATCH_SECONDS = 60
+    # How often the sleeping holder polls PRAGMA data_version (no table reads), so ENGAGE/STOP/interval
+    # changes saved by another process apply within a tick rather than at the next heartbeat.
+    WATCH_TICK = 0.25
+    # Share of the interval a queued scan may use, so one run is finished before the next is due.
+    BUDGET_SHARE = 0.8
+
+    @staticmethod
+    def thread():
+        return next((t for t in threading.enumerate() if t.name == "HunterLoop"), None)
+
+    @staticmethod
+    def start():
+        """Starts this process's HunterLoop; across processes the lease decides which one actually schedules."""
+        if Scheduler.thread(): return
+        wake = threading.Event()
+        t = threading.Thread(target=Scheduler.background_loop, args=(wake,), name="HunterLoop", daemon=True)
+        t.wake = wake
+        t.start()
+        atexit.register(SchedulerLease.release, SchedulerLease.holder_id())
+
+    @staticmethod
+    def notify():
+        """Wakes this process's loop at once; a holder in another process sees the change on its next WATCH_TICK."""
+        t = Scheduler.thread()
+        if t is not None and hasattr(t, "wake"): t.wake.set()
+
+    @staticmethod
+    def state():
+        conn = sqlite3.connect(Database.DB_FILE)
+        row = conn.execute("SELECT autopilot_active, interval, next_run_at FROM system_state WHERE id=1").fetchone()
+        conn.close()
+        return row
+
+    @staticmethod
+    def update(**fields):
+        conn = sqlite3.connect(Database.DB_FILE)
+        conn.execute(f"UPDATE system_state SET {', '.join(f'{k}=?' for k in fields)} WHERE id=1", list(fields.values()))
+        conn.commit(); conn.close()
+        Scheduler.notify()
 
     @staticmethod
-    def background_loop():
+    def background_loop(wake):
+        # One long-lived connection: data_version only moves when another connection commits.
+        conn = sqlite3.connect(Database.DB_FILE)
+        me = SchedulerLease.holder_id()
+        seen, state, shown, beat = None, None, None, 0.0
         while True:
-            conn = sqlite3.connect(Database.DB_FILE)
-            state = conn.execute("SELECT autopilot_active, interval FROM system_state WHERE id=1").fetchone()
-            conn.close()
-            if state and state[0]:
-                PassiveScanner.run_scan()
-                time.sleep(Scheduler.INTERVAL_MAP.get(state[1], 3600))
-            else: time.sleep(5)
+            wake.clear()
+            if time.time() - beat >= SchedulerLease.HEARTBEAT:
+                holding = SchedulerLease.acquire(me)
+                beat = time.time()
+            if not holding:
+                wake.wait(SchedulerLease.HEARTBEAT)
+                continue
+
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != seen:
+                seen = version
+                state = conn.execute("SELECT autopilot_active, interval, last_run_at, adaptive_seconds, adaptive_max FROM system_state WHERE id=1").fetchone()
+            active, interval, last_run, learned, ceiling = state
+            every = Scheduler.INTERVAL_MAP.get(interval, 3600) or learned or ceiling
+
+            due = (last_run or 0) + every if active else None
+            if due is not None and time.time() >= due:
+                # The scan itself runs in scan_worker.py; the dashboard process only queues it.
+                JobQueue.enqueue("scan", {"budget_s": every * Scheduler.BUDGET_SHARE}, dedupe=True)
+                state = (active, interval, time.time(), learned, ceiling)
+                conn.execute("UPDATE system_state SET last_run_at=? WHERE id=1", (state[2],))
+                conn.commit()
+                continue
+
+            next_at = datetime.datetime.fromtimestamp(due).strftime("%Y-%m-%d %H:%M:%S") if due else None
+            if next_at != shown:
+                conn.execute("UPDATE system_state SET next_run_at=? WHERE id=1", (next_at,))
+                conn.commit()
+                shown = next_at
+            until_beat = beat + SchedulerLease.HEARTBEAT - time.time()
+            end = time.time() + max(0, min(due - time.time() if due else Scheduler.WATCH_SECONDS, Scheduler.WATCH_SECONDS, until_beat))
+            while not wake.is_set() and time.time() < end:
+                if conn.execute("PRAGMA data_version").fetchone()[0] != seen: break
+                wake.wait(min(Scheduler.WATCH_TICK, max(0, end - time.time())))
+
+# Seconds between refreshes of the live panels. Each tick re-runs only that fragment, and its
+# reads go through DataCache, so an unchanged table costs one PRAGMA data_version.
+LIVE_REFRESH = {"status": 5, "jobs": 5, "deep_logs": 10, "runs": 30}
+
+@fragment(run_every=LIVE_REFRESH["status"])
+def status_panel():
+    active, _, next_run_at = Database.cached(("system_state",), "system_state", Scheduler.state)
+    st.metric("System Status", "RUNNING" if active else "IDLE")
+    if active: st.caption(f"Next scan: {next_run_at or 'starting now'}")
+    lease = SchedulerLease.status(Database.cached(("scheduler_lease",), "scheduler_lease", SchedulerLease.row))
+    if lease["holder"] is None: st.caption("Scheduler: no instance holds the lease")
+    else:
+        owner = "this process" if lease["mine"] else lease["holder"]
+        health = "STALE" if lease["stale"] else f"heartbeat {lease['heartbeat_age']:.0f}s ago"
+        st.caption(f"Scheduler: {owner} since {lease['acquired_at']} · {health}")
+    if st.button("🚀 ENGAGE" if not active else "🛑 STOP"):
+        if active: Scheduler.update(autopilot_active=0)
+        else: Scheduler.update(autopilot_active=1, last_run_at=None)
+        st.rerun(scope="fragment")
+
+@fragment(run_every=LIVE_REFRESH["jobs"])
+def jobs_panel():
+    st.subheader("Jobs")
+    waiting = Database.cached(("jobs",), "oldest_waiting", JobQueue.oldest_waiting)
+    if waiting and datetime.datetime.now() - datetime.datetime.strptime(waiting, "%Y-%m-%d %H:%M:%S") > datetime.timedelta(minutes=2):
+        st.warning(f"Jobs have been waiting since {waiting}. Is a worker running? Start one with `python scan_worker.py`.")
+    jobs = Database.cached(("jobs",), "jobs", JobQueue.recent)
+    if jobs:
+        st.dataframe(pd.DataFrame(jobs)[["id", "kind", "status", "attempts", "worker", "created_at", "duration", "result", "error"]],
+                     use_container_width=True, hide_index=True)
+    else:
+        st.caption("No jobs yet.")
+
+@fragment(run_every=LIVE_REFRESH["deep_logs"])
+def deep_logs_panel():
+    """Keyset pages of PAGE_ROWS leads; the first page follows new leads live, older pages stay put."""
+    f1, f2, f3, f4 = st.columns([2, 2, 3, 3])
+    keywords = Database.cached(("deep_logs",), "lead_keywords", Database.lead_keywords)
+    keyword = f1.selectbox("Keyword", ["All", *keywords], key="dl_keyword")
+    profile = f2.text_input("Profile", key="dl_profile")
+    search = f3.text_input("Message contains", key="dl_search")
+    dates = f4.date_input("Scanned between", value=(), key="dl_dates")
+    since, until = (tuple(dates) + (None, None))[:2]
+    filters = (None if keyword == "All" else keyword, profile.strip(), search.strip(), since, until)
+
+    # A stack of before-id cursors; any filter change goes back to the newest page.
+    if st.session_state.get("dl_filters") != filters:
+        st.session_state.dl_filters, st.session_state.dl_cursors = filters, [None]
+    cursors = st.session_state.dl_cursors
+    page = Database.cached(("deep_logs",), ("lead_page", cursors[-1], *filters), lambda: Database.page_leads(cursors[-1], *filters))
+    has_older = len(page) > Database.PAGE_ROWS
+    page = page.head(Database.PAGE_ROWS)
+    st.dataframe(page, use_container_width=True, hide_index=True)
+
+    n1, n2, n3 = st.columns([1, 1, 4])
+    if len(cursors) > 1 and n1.button("← Newer", key="dl_newer"):
+        cursors.pop(); st.rerun(scope="fragment")
+    if has_older and n2.button("Older →", key="dl_older"):
+        cursors.append(int(page["id"].iloc[-1])); st.rerun(scope="fragment")
+    total = Database.cached(("deep_logs",), "lead_count", Database.lead_count)
+    n3.caption(f"Page {len(cursors)} · {len(page)} shown · {total} leads logged in total")
+    if len(cursors) == 1 and not any(filters):
+        Snapshot("leads").refresh(DataCache.versions(Database.DB_FILE).get("deep_logs"), lambda: ({"leads": page}, {"lead_count": total}))
+
+# Chart range -> (rollup grain, how far back it reaches).
+LEAD_RANGES = {"Last 48 hours": ("hour", datetime.timedelta(hours=48)), "Last 30 days": ("day", datetime.timedelta(days=30)),
+               "Last 12 months": ("day", datetime.timedelta(days=365))}
+
+@fragment(run_every=LIVE_REFRESH["deep_logs"])
+def lead_charts_panel():
+    choice = st.radio("Range", list(LEAD_RANGES), horizontal=True, key="lead_range", label_visibility="collapsed")
+    grain, span = LEAD_RANGES[choice]
+    # Bucket the cache key by the hour so the window slides without a write.
+    since = (datetime.datetime.now() - span).replace(minute=0, second=0, microsecond=0)
+    rollup = Database.cached(("deep_logs",), ("lead_rollup", grain, since), lambda: Database.lead_rollup(grain, since))
+    if rollup.empty:
+        st.caption("No leads in this range yet.")
+        return
+    c1, c2 = st.columns([2, 1])
+    with c1:
+        st.caption("📈 Leads Detected Over Time")
+        st.bar_chart(rollup.pivot_table(index="bucket", columns="keyword", values="leads", aggfunc="sum", fill_value=0))
+    with c2:
+        st.caption("🎯 Keyword Distribution")
+        st.bar_chart(rollup.groupby("keyword")["leads"].sum().sort_values(ascending=False), horizontal=True)
+
+@fragment(run_every=LIVE_REFRESH["runs"])
+def runs_panel():
+    st.subheader("Scan Run History")
+    runs = pd.DataFrame(Database.cached(("scan_runs",), "scan_runs", lambda: RunHistory.recent(200)))
+    if runs.empty:
+        st.info("No scans recorded yet.")
+    else:
+        for col, kind in zip(st.columns(2), ("passive", "scrape")):
+            pct = Database.cached(("scan_runs",), ("percentiles", kind), lambda: RunHistory.percentiles(kind))
+            with col:
+                st.metric(f"{kind.title()} p50", f"{pct[50]:.1f}s" if pct[50] is not None else "—")
+                st.metric(f"{kind.title()} p95", f"{pct[95]:.1f}s" if pct[95] is not None else "—")
+        runs["started_at"] = pd.to_datetime(runs["started_at"])
+        kind = st.radio("Scanner", ["passive", "scrape"], horizontal=True, key="runs_kind")
+        subset = runs[runs["kind"] == kind].set_index("started_at")
+        if not subset.empty:
+            st.caption("Time per stage (s)")
+            st.area_chart(subset[[f"{s}_s" for s in RunHistory.STAGES]])
+            st.caption("Rows seen / matches / inserts / errors")
+            st.line_chart(subset[list(RunHistory.COUNTERS)])
+        st.dataframe(runs.sort_values("id", ascending=False), use_container_width=True, hide_index=True)
+
+    traces = TraceRecorder.kept()
+    if traces:
+        st.subheader("Kept Traces")
+        st.caption(f"Failed or slower-than-p95 scans · open with `playwright show-trace <path>/trace.zip` · quota {TraceRecorder.QUOTA_MB} MB")
+        st.dataframe(pd.DataFrame(traces), use_container_width=True, hide_index=True)
 
 def main():
     st.set_page_config(layout="wide", page_title="Logistics Box")
     setup_style()
     Database.init()
 
-    if not any(t.name == "HunterLoop" for t in threading.enumerate()):
-        threading.Thread(target=Scheduler.background_loop, name="HunterLoop", daemon=True).start()
+    Scheduler.start()
 
     st.title("📦 Logistics Intelligence Box")
     
@@ -196,6 +640,11 @@ def main():
                 st.success("Session updated!")
                 st.rerun()
 
+        cache = DataCache.stats()
+        st.caption(f"⚡ Query cache: {cache[-1]['hit_rate']:.0%} hits ({cache[-1]['hits']}/{cache[-1]['hits'] + cache[-1]['misses']})")
+        with st.expander("Cache detail"):
+            st.dataframe(pd.DataFrame(cache), hide_index=True, use_container_width=True)
+
         st.divider()
         m_name = st.text_input("New Macro Name", "Reply_Firewood")
         if st.button("🔴 Record New Macro"):
@@ -206,33 +655,49 @@ def main():
                     st.rerun()
 
     # MAIN TABS
-    tab_dash, tab_logs, tab_watch, tab_macros = st.tabs(["🎮 Control", "📚 Database", "🎯 Watchlist", "🔴 Macros"])
+    tab_dash, tab_logs, tab_runs, tab_watch, tab_macros = st.tabs(["🎮 Control", "📚 Database", "📈 Runs", "🎯 Watchlist", "🔴 Macros"])
 
     with tab_dash:
-        conn = sqlite3.connect(Database.DB_FILE)
-        active, current_interval = conn.execute("SELECT autopilot_active, interval FROM system_state WHERE id=1").fetchone()
-        conn.close()
+        current_interval = Database.cached(("system_state",), "system_state", Scheduler.state)[1]
 
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("System Status", "RUNNING" if active else "IDLE")
-            if st.button("🚀 ENGAGE" if not active else "🛑 STOP"):
-                conn = sqlite3.connect(Database.DB_FILE)
-                conn.execute("UPDATE system_state SET autopilot_active=? WHERE id=1", (0 if active else 1,))
-                conn.commit(); conn.close()
-                st.rerun()
+            status_panel()
         with col2:
             freq = st.selectbox("Interval", list(Scheduler.INTERVAL_MAP.keys()), index=list(Scheduler.INTERVAL_MAP.keys()).index(current_interval))
+            if freq == "Adaptive":
+                learned, lo, hi = AdaptiveInterval.current()
+                a1, a2 = st.columns(2)
+                lo_min = a1.number_input("Min (minutes)", value=lo / 60, min_value=1.0, key="ad_min")
+                hi_min = a2.number_input("Max (minutes)", value=max(hi / 60, lo_min), min_value=lo_min, key="ad_max")
+                st.caption(f"Learned interval: {learned / 60:.1f} min")
             if st.button("Update Frequency"):
-                conn = sqlite3.connect(Database.DB_FILE)
-                conn.execute("UPDATE system_state SET interval=? WHERE id=1", (freq,))
-                conn.commit(); conn.close()
+                if freq == "Adaptive": AdaptiveInterval.set_limits(lo_min * 60, hi_min * 60)
+                Scheduler.update(interval=freq)
                 st.rerun()
 
+        jobs_panel()
+
     with tab_logs:
         st.subheader("Deep Logs (Keyword Matches)")
-        df = pd.read_sql("SELECT * FROM deep_logs ORDER BY id DESC", sqlite3.connect(Database.DB_FILE))
-        st.dataframe(df, use_container_width=True)
+        if st.button("📤 Export to CSV"):
+            JobQueue.enqueue("export", {"table": "deep_logs"})
+            st.success("Export queued — the file will appear under exports/.")
+        # A new session shows the last snapshot of the newest leads until the live panels below have loaded.
+        preview = st.empty()
+        if "painted" not in st.session_state:
+            st.session_state.painted = True
+            meta, tables = Snapshot("leads").read()
+            if meta:
+                with preview.container():
+                    st.caption(f"Snapshot from {meta['written_at']} · {meta['lead_count']} leads · loading live data…")
+                    st.dataframe(tables["leads"], use_container_width=True, hide_index=True)
+        lead_charts_panel()
+        deep_logs_panel()
+        preview.empty()
+
+    with tab_runs:
+        runs_panel()
 
     with tab_watch:
         st.subheader("Manage Tracking Phrases")
@@ -243,7 +708,7 @@ def main():
             conn.commit(); conn.close()
             st.rerun()
         
-        words = pd.read_sql("SELECT * FROM watchlist", sqlite3.connect(Database.DB_FILE))
+        words = Database.cached(("watchlist",), "watchlist", lambda: Database.read_df("SELECT * FROM watchlist"))
         for _, row in words.iterrows():
             c1, c2 = st.columns([5, 1])
             c1.write(f"🔍 {row['word']}")
@@ -254,7 +719,7 @@ def main():
 
     with tab_macros:
         st.subheader("Saved Macros")
-        macros_df = pd.read_sql("SELECT * FROM macros ORDER BY id DESC", sqlite3.connect(Database.DB_FILE))
+        macros_df = Database.cached(("macros",), "macros", lambda: Database.read_df("SELECT * FROM macros ORDER BY id DESC"))
         if not macros_df.empty:
             for _, row in macros_df.iterrows():
                 steps = json.loads(row['steps'])
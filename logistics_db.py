@@ -1,15 +1,34 @@
-import streamlit as st
-import pandas as pd
 import sqlite3
 import re
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from playwright.sync_api import sync_playwright
+import paths
+from lazy_imports import lazy, fragment
+from browser_kit import RoutePolicy
+from page_archive import PageArchive, Extractors
+from job_queue import JobQueue
+from run_history import RunTimer, ScanBudget
+from data_cache import DataCache
+from snapshot import Snapshot
+
+st = lazy("streamlit")
+pd = lazy("pandas")
 
 # ==========================================
 # PART 1: THE DATABASE ENGINE
 # ==========================================
 class Database:
-    DB_FILE = "logistics.db"
+    DB_FILE = paths.ORDERS_DB
+    CACHED_TABLES = ("orders", "backfill_state")
+    ALL_CITIES = object()
+    SUMMARY_DIMS = ("city", "product", "status")
+    DELIVERED = "Delivered"
+    SORTS = {"Newest": "id DESC", "Oldest": "id ASC", "Value ↓": "value DESC, id DESC", "Value ↑": "value ASC, id DESC",
+             "Customer": "customer COLLATE NOCASE, id DESC", "Status": "status, id DESC"}
+    EDITABLE = ("status", "product", "value", "address", "city")
+    # The analyzer only moves orders out of New; Delivered, Cancelled and the like are left as they are.
+    ANALYZED_STATUS = "CASE WHEN status IS NULL OR status = 'New' THEN ? ELSE status END"
 
     @staticmethod
     def init():
@@ -25,8 +44,75 @@ class Database:
                       value REAL,
                       address TEXT,
                       city TEXT)''')
+        c.execute('''CREATE TABLE IF NOT EXISTS backfill_state
+                     (id INTEGER PRIMARY KEY,
+                      page_url TEXT,
+                      last_thread TEXT,
+                      pages_done INTEGER,
+                      threads_saved INTEGER,
+                      status TEXT,
+                      updated_at TEXT)''')
+        try: c.execute("ALTER TABLE orders ADD COLUMN thread_url TEXT")
+        except sqlite3.OperationalError: pass
+        c.execute("CREATE INDEX IF NOT EXISTS orders_city ON orders (city, id)")
+        c.execute('''CREATE TABLE IF NOT EXISTS scan_backlog
+                     (url TEXT PRIMARY KEY, name TEXT, date TEXT, unread INTEGER, queued_at TEXT)''')
+        try: c.execute("ALTER TABLE scan_backlog ADD COLUMN attempts INTEGER DEFAULT 0")
+        except sqlite3.OperationalError: pass
+        c.execute("INSERT OR IGNORE INTO backfill_state (id, pages_done, threads_saved, status) VALUES (1, 0, 0, 'idle')")
+        Database.init_summary(c)
         conn.commit()
         conn.close()
+        DataCache.install(Database.DB_FILE, Database.CACHED_TABLES)
+
+    @staticmethod
+    def init_summary(c):
+        """Order counts and revenue per city/product/status plus overall totals, kept current by triggers on orders.
+
+        NULL dimension values are stored under '' so they can be part of the primary key."""
+        fresh = not c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='order_totals'").fetchone()
+        c.execute("CREATE TABLE IF NOT EXISTS order_summary (dim TEXT, key TEXT, orders INTEGER, revenue REAL, PRIMARY KEY (dim, key))")
+        c.execute("CREATE TABLE IF NOT EXISTS order_totals (id INTEGER PRIMARY KEY, orders INTEGER, revenue REAL, delivered_value REAL)")
+        if fresh: Database.rebuild_summary(c)
+
+        def add(row, sign):
+            value = f"COALESCE({row}.value, 0)"
+            stmts = [f"""INSERT INTO order_summary (dim, key, orders, revenue) VALUES ('{d}', COALESCE({row}.{d}, ''), {sign}1, {sign}{value})
+                         ON CONFLICT (dim, key) DO UPDATE SET orders = orders + excluded.orders, revenue = revenue + excluded.revenue;"""
+                     for d in Database.SUMMARY_DIMS]
+            stmts.append(f"""UPDATE order_totals SET orders = orders {sign} 1, revenue = revenue {sign} {value},
+                             delivered_value = delivered_value {sign} CASE WHEN {row}.status = '{Database.DELIVERED}' THEN {value} ELSE 0 END WHERE id = 1;""")
+            return "\n".join(stmts)
+
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS orders_summary_insert AFTER INSERT ON orders BEGIN {add('NEW', '+')} END")
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS orders_summary_delete AFTER DELETE ON orders BEGIN {add('OLD', '-')} END")
+        c.execute(f"""CREATE TRIGGER IF NOT EXISTS orders_summary_update AFTER UPDATE OF {', '.join(Database.SUMMARY_DIMS)}, value ON orders
+                      BEGIN {add('OLD', '-')} {add('NEW', '+')} END""")
+
+    @staticmethod
+    def rebuild_summary(c):
+        c.execute("DELETE FROM order_summary")
+        for d in Database.SUMMARY_DIMS:
+            c.execute(f"INSERT INTO order_summary (dim, key, orders, revenue) SELECT '{d}', COALESCE({d}, ''), COUNT(*), COALESCE(SUM(value), 0) FROM orders GROUP BY 2")
+        c.execute("""INSERT OR REPLACE INTO order_totals (id, orders, revenue, delivered_value)
+                     SELECT 1, COUNT(*), COALESCE(SUM(value), 0), COALESCE(SUM(CASE WHEN status = ? THEN value END), 0) FROM orders""",
+                  (Database.DELIVERED,))
+
+    @staticmethod
+    def totals():
+        """{orders, revenue, delivered, open}: one row, whatever the size of orders."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        orders, revenue, delivered = conn.execute("SELECT orders, revenue, delivered_value FROM order_totals WHERE id=1").fetchone()
+        conn.close()
+        return {"orders": orders, "revenue": round(revenue, 2), "delivered": round(delivered, 2), "open": round(revenue - delivered, 2)}
+
+    @staticmethod
+    def summary(dim):
+        """[(value, orders, revenue)] for one of SUMMARY_DIMS, busiest first; '' comes back as None."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        rows = conn.execute("SELECT key, orders, revenue FROM order_summary WHERE dim=? AND orders > 0 ORDER BY orders DESC, key", (dim,)).fetchall()
+        conn.close()
+        return [(key or None, orders, round(revenue, 2)) for key, orders, revenue in rows]
 
     @staticmethod
     def save_order(customer, msg, date):
@@ -42,6 +128,46 @@ class Database:
         finally:
             conn.close()
 
+    @staticmethod
+    def save_orders(items):
+        """Inserts a batch in one transaction; returns (id, raw_message) for the new rows."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        saved = []
+        try:
+            with conn:
+                for item in items:
+                    c = conn.execute("INSERT OR IGNORE INTO orders (customer, raw_message, date_found, status, thread_url) VALUES (?, ?, ?, ?, ?)",
+                                     (item['customer'], item['raw_message'], item['date'], "New", item.get('url')))
+                    if c.rowcount: saved.append((c.lastrowid, item['raw_message']))
+        finally:
+            conn.close()
+        return saved
+
+    @staticmethod
+    def refresh_orders(items):
+        """Like save_orders, but replaces the message of an existing order from the same thread URL."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        changed = []
+        try:
+            with conn:
+                for item in items:
+                    row = conn.execute("SELECT id, raw_message FROM orders WHERE thread_url=? ORDER BY id DESC", (item['url'],)).fetchone()
+                    if row and row[1] == item['raw_message']: continue
+                    try:
+                        if row:
+                            # Only an order the analyzer owns goes back to New; a status someone set by hand stays.
+                            conn.execute("UPDATE orders SET raw_message=?, status=CASE WHEN status='Analyzed' THEN 'New' ELSE status END WHERE id=?",
+                                         (item['raw_message'], row[0]))
+                            changed.append((row[0], item['raw_message']))
+                            continue
+                        c = conn.execute("INSERT OR IGNORE INTO orders (customer, raw_message, date_found, status, thread_url) VALUES (?, ?, ?, ?, ?)",
+                                         (item['customer'], item['raw_message'], item['date'], "New", item['url']))
+                        if c.rowcount: changed.append((c.lastrowid, item['raw_message']))
+                    except sqlite3.IntegrityError: continue
+        finally:
+            conn.close()
+        return changed
+
     @staticmethod
     def fetch_all():
         conn = sqlite3.connect(Database.DB_FILE)
@@ -49,17 +175,106 @@ class Database:
         conn.close()
         return df
 
+    @staticmethod
+    def _filters(city, search):
+        where, args = [], []
+        if city is not Database.ALL_CITIES:
+            where.append("city IS ?"); args.append(city)
+        if search:
+            where.append("(customer LIKE ? OR raw_message LIKE ? OR address LIKE ? OR product LIKE ?)")
+            args += [f"%{search}%"] * 4
+        return (" WHERE " + " AND ".join(where)) if where else "", args
+
+    @staticmethod
+    def count_orders(city=None, search=""):
+        where, args = Database._filters(city, search)
+        conn = sqlite3.connect(Database.DB_FILE)
+        total = conn.execute(f"SELECT COUNT(*) FROM orders{where}", args).fetchone()[0]
+        conn.close()
+        return total
+
+    @staticmethod
+    def page_orders(city=None, search="", sort="Newest", limit=25, offset=0):
+        """Only the visible page of orders is read."""
+        where, args = Database._filters(city, search)
+        conn = sqlite3.connect(Database.DB_FILE)
+        df = pd.read_sql_query(f"SELECT id, customer, date_found, status, product, value, address, city, raw_message FROM orders{where} "
+                               f"ORDER BY {Database.SORTS[sort]} LIMIT ? OFFSET ?", conn, params=[*args, limit, offset])
+        conn.close()
+        return df
+
+    @staticmethod
+    def city_addresses(city):
+        conn = sqlite3.connect(Database.DB_FILE)
+        addrs = [a for (a,) in conn.execute("SELECT address FROM orders WHERE city IS ? AND address IS NOT NULL ORDER BY id", (city,))]
+        conn.close()
+        return addrs
+
+    @staticmethod
+    def update_orders(changes):
+        """changes: {order id: {column: value}} for the EDITABLE columns, committed together."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        with conn:
+            for order_id, fields in changes.items():
+                fields = {k: v for k, v in fields.items() if k in Database.EDITABLE}
+                if fields:
+                    conn.execute(f"UPDATE orders SET {', '.join(f'{k}=?' for k in fields)} WHERE id=?", [*fields.values(), order_id])
+        conn.close()
+
+    @staticmethod
+    def delete_orders(order_ids):
+        conn = sqlite3.connect(Database.DB_FILE)
+        with conn:
+            conn.executemany("DELETE FROM orders WHERE id=?", [(i,) for i in order_ids])
+        conn.close()
+
     @staticmethod
     def update_analysis(order_id, product, value, address, city, status="Analyzed"):
         conn = sqlite3.connect(Database.DB_FILE)
         c = conn.cursor()
-        c.execute('''UPDATE orders 
-                     SET product=?, value=?, address=?, city=?, status=? 
+        c.execute(f'''UPDATE orders 
+                     SET product=?, value=?, address=?, city=?, status={Database.ANALYZED_STATUS} 
                      WHERE id=?''', 
                   (product, value, address, city, status, order_id))
         conn.commit()
         conn.close()
 
+    @staticmethod
+    def update_analysis_many(rows):
+        """rows: (product, value, address, city, status, id) tuples, committed together; status only replaces New."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        with conn:
+            conn.executemany(f"UPDATE orders SET product=?, value=?, address=?, city=?, status={Database.ANALYZED_STATUS} WHERE id=?", rows)
+        conn.close()
+
+    @staticmethod
+    def take_backlog():
+        """Threads a previous run ran out of budget for or failed to open; unread ones first."""
+        conn = sqlite3.connect(Database.DB_FILE)
+        rows = conn.execute("SELECT name, url, date, unread, attempts FROM scan_backlog ORDER BY unread DESC, queued_at").fetchall()
+        conn.close()
+        return [{"name": n, "url": u, "date": d, "unread": bool(r), "attempts": a or 0} for n, u, d, r, a in rows]
+
+    @staticmethod
+    def replace_backlog(targets):
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = sqlite3.connect(Database.DB_FILE)
+        with conn:
+            conn.execute("DELETE FROM scan_backlog")
+            conn.executemany("INSERT OR IGNORE INTO scan_backlog (url, name, date, unread, queued_at, attempts) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(t['url'], t['name'], t['date'], int(t.get('unread', False)), now, t.get('attempts', 0)) for t in targets])
+        conn.close()
+
+    @staticmethod
+    def add_backlog(targets):
+        """Queues targets for the next scrape without dropping what is already waiting."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = sqlite3.connect(Database.DB_FILE)
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO scan_backlog (url, name, date, unread, queued_at, attempts) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(t['url'], t['name'], t['date'], int(t.get('unread', False)), now, t.get('attempts', 0)) for t in targets])
+        conn.close()
+
     @staticmethod
     def delete_order(order_id):
         conn = sqlite3.connect(Database.DB_FILE)
@@ -72,15 +287,95 @@ class Database:
 # PART 2: THE SCRAPER ENGINE
 # ==========================================
 class ScraperBot:
+    BATCH_SIZE = 5
+    AUTH_FILE = "fb_auth.json"
+    HEADLESS = False
+    TIME_BUDGET = 300
+    PAGE_BUDGET = 60
+    # Most of a run's budget the inbox index may use before thread pages are fetched.
+    INDEX_SHARE = 0.25
+    # A thread that fails this many runs in a row is dropped from the backlog.
+    MAX_ATTEMPTS = 3
+
+    @staticmethod
+    @contextmanager
+    def session(headless=None, policy=None, timer=None):
+        """One browser context shared by the indexer and the detail fetcher."""
+        policy = policy or RoutePolicy(RoutePolicy.MBASIC)
+        timer = timer or RunTimer()
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:
+            with timer.stage("launch"):
+                browser = p.chromium.launch(headless=ScraperBot.HEADLESS if headless is None else headless)
+            try:
+                with timer.stage("launch"):
+                    context = browser.new_context(storage_state=ScraperBot.AUTH_FILE)
+                    policy.install(context)
+                yield context
+            finally:
+                browser.close()
+
+    @staticmethod
+    def prioritize(backlog, fresh):
+        """Carry-over first, then unread, then newest; each URL once."""
+        seen, ordered = set(), []
+        for t in backlog + sorted(fresh, key=lambda t: not t.get('unread')):
+            if t['url'] in seen: continue
+            seen.add(t['url'])
+            ordered.append(t)
+        return ordered
+
     @staticmethod
-    def run(limit_count, limit_days):
-        print(f"DEBUG: Indexing last {limit_days} days...")
-        targets = InboxIndexer.build_target_list(limit_count, limit_days)
-        if not targets: return []
-        print(f"DEBUG: Found {len(targets)} targets. Fetching details...")
-        return SafeWorker.fetch_details(targets)
+    def run(limit_count, limit_days, schema=None, on_progress=None, budget=None):
+        """Streams threads into the DB as they arrive; each batch is saved and analyzed in its own transaction.
+
+        Stops cleanly when the budget runs out and leaves the unvisited and failed threads in scan_backlog for the next run."""
+        schema = schema or Analyzer.DEFAULT_SCHEMA
+        budget = budget or ScanBudget(ScraperBot.TIME_BUDGET, ScraperBot.PAGE_BUDGET)
+        stats = {"fetched": 0, "saved": 0, "analyzed": 0, "remaining": 0, "failed": 0}
+        batch = []
+
+        def flush():
+            with timer.stage("match"):
+                saved = Database.save_orders(batch)
+                batch.clear()
+                stats["saved"] += len(saved)
+                stats["analyzed"] += Analyzer.analyze_batch(saved, schema)
+            if on_progress: on_progress(dict(stats))
+
+        policy = RoutePolicy(RoutePolicy.MBASIC)
+        timer = RunTimer("scrape")
+        try:
+            with ScraperBot.session(policy=policy, timer=timer) as context:
+                # The index is read up front so unread threads can go first, but only up to INDEX_SHARE of the budget.
+                fresh = list(InboxIndexer.iter_targets(context, limit_count, limit_days, timer, budget.portion(ScraperBot.INDEX_SHARE)))
+                queue = ScraperBot.prioritize(Database.take_backlog(), fresh)
+                pending, failed = iter(queue), []
+                try:
+                    for item in SafeWorker.iter_details(context, pending, timer, budget, failed=failed):
+                        batch.append(item)
+                        stats["fetched"] += 1
+                        if len(batch) >= ScraperBot.BATCH_SIZE: flush()
+                        elif on_progress: on_progress(dict(stats))
+                finally:
+                    if batch: flush()
+                    # iter_details checks the budget before taking the next target, so whatever is left was never opened.
+                    left = list(pending)
+                    retry = [dict(t, attempts=t.get('attempts', 0) + 1) for t in failed if t.get('attempts', 0) + 1 < ScraperBot.MAX_ATTEMPTS]
+                    Database.replace_backlog(left + retry)
+                    stats["remaining"], stats["failed"] = len(left), len(failed)
+        except Exception as e:
+            timer.fail(e)
+            raise
+        finally:
+            timer.count(rows_seen=stats["fetched"], matches=stats["analyzed"], inserts=stats["saved"])
+            timer.save()
+        stats["net"] = policy.report()
+        return stats
 
 class InboxIndexer:
+    BASE_URL = "https://mbasic.facebook.com"
+
     @staticmethod
     def parse_date(date_str):
         now = datetime.now()
@@ -93,96 +388,360 @@ class InboxIndexer:
         return now - timedelta(days=365)
 
     @staticmethod
-    def build_target_list(limit_count, limit_days):
-        targets = []
+    def read_page(page):
+        """Threads listed on the currently loaded inbox page, in display order."""
+        found = []
+        for thread in page.query_selector_all("table h3"):
+            try:
+                name = thread.inner_text()
+                anchor = thread.query_selector("xpath=ancestor::a")
+                if not anchor: continue
+                full_link = InboxIndexer.BASE_URL + anchor.get_attribute("href")
+                row = thread.query_selector("xpath=ancestor::tr")
+                abbr = row.query_selector("abbr")
+                time_str = abbr.inner_text() if abbr else "Today"
+                unread = thread.query_selector("strong, b") is not None
+                found.append({"name": name, "url": full_link, "date": time_str, "unread": unread})
+            except: continue
+        return found
+
+    @staticmethod
+    def older_link(page):
+        next_btn = page.query_selector("#see_older_threads a")
+        return InboxIndexer.BASE_URL + next_btn.get_attribute("href") if next_btn else None
+
+    @staticmethod
+    def iter_targets(context, limit_count, limit_days, timer=None, budget=None):
+        """Yields inbox threads newest-first, paging on demand until the budget runs out."""
+        timer = timer or RunTimer()
+        budget = budget or ScanBudget()
+        found = 0
         cutoff = datetime.now() - timedelta(days=limit_days)
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(storage_state="fb_auth.json")
-            page = context.new_page()
-            page.goto("https://mbasic.facebook.com/messages/")
-            keep_scanning = True
-            while keep_scanning and len(targets) < limit_count:
-                threads = page.query_selector_all("table h3")
-                if not threads: break
-                for thread in threads:
-                    if len(targets) >= limit_count: break
-                    try:
-                        name = thread.inner_text()
-                        anchor = thread.query_selector("xpath=ancestor::a")
-                        if not anchor: continue
-                        full_link = "https://mbasic.facebook.com" + anchor.get_attribute("href")
-                        row = thread.query_selector("xpath=ancestor::tr")
-                        abbr = row.query_selector("abbr")
-                        time_str = abbr.inner_text() if abbr else "Today"
-                        if InboxIndexer.parse_date(time_str) >= cutoff:
-                            targets.append({"name": name, "url": full_link, "date": time_str})
-                        else:
-                            keep_scanning = False; break
-                    except: continue
-                next_btn = page.query_selector("#see_older_threads a")
-                if next_btn: next_btn.click()
-                else: keep_scanning = False
-            browser.close()
-        return targets
+        page = context.new_page()
+        if not budget.take_page():
+            page.close(); return
+        with timer.stage("nav"): page.goto(InboxIndexer.BASE_URL + "/messages/", timeout=budget.timeout_ms(30000))
+        keep_scanning = True
+        while keep_scanning and found < limit_count:
+            with timer.stage("extract"): threads = InboxIndexer.read_page(page)
+            if not threads: break
+            for t in threads:
+                if found >= limit_count: break
+                if InboxIndexer.parse_date(t['date']) < cutoff:
+                    keep_scanning = False; break
+                found += 1
+                yield t
+            next_link = InboxIndexer.older_link(page)
+            if next_link and found < limit_count and budget.take_page():
+                with timer.stage("nav"): page.goto(next_link, timeout=budget.timeout_ms(30000))
+            else: keep_scanning = False
+        page.close()
+
+    @staticmethod
+    def build_target_list(limit_count, limit_days):
+        with ScraperBot.session(headless=True) as context:
+            return list(InboxIndexer.iter_targets(context, limit_count, limit_days))
 
 class SafeWorker:
+    @staticmethod
+    def iter_details(context, targets, timer=None, budget=None, pace=None, failed=None):
+        """Opens each target in turn; stops before taking the next one once the budget is spent.
+
+        pace(), when given, runs before every navigation and returns False to stop early.
+        Targets that raise are appended to failed, when given, so the caller can retry them."""
+        timer = timer or RunTimer()
+        budget = budget or ScanBudget()
+        targets = iter(targets)
+        page = context.new_page()
+        while not budget.exhausted():
+            t = next(targets, None)
+            if t is None: break
+            if pace and not pace(): break
+            budget.take_page()
+            try:
+                with timer.stage("nav"): page.goto(t['url'], timeout=budget.timeout_ms(30000))
+                with timer.stage("extract"):
+                    html = page.content()
+                    PageArchive.store(t['url'], html, "thread", {"name": t['name'], "date": t['date']})
+                    clean_msg = Extractors.thread(html)
+            except Exception as e:
+                timer.fail(e)
+                if failed is not None: failed.append(t)
+                continue
+            yield {"customer": t['name'], "raw_message": clean_msg, "date": t['date'], "url": t['url']}
+        page.close()
+
     @staticmethod
     def fetch_details(target_list):
-        data = []
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            context = browser.new_context(storage_state="fb_auth.json")
-            page = context.new_page()
-            for t in target_list:
-                try:
-                    page.goto(t['url'])
-                    raw_text = page.inner_text("div#root")
-                    lines = [l for l in raw_text.split('\n') if len(l) > 10]
-                    clean_msg = " || ".join(lines[-10:])
-                    data.append({"customer": t['name'], "raw_message": clean_msg, "date": t['date']})
-                except: pass
-            browser.close()
-        return data
+        with ScraperBot.session() as context:
+            return list(SafeWorker.iter_details(context, target_list))
+
+class BackfillJob:
+    """Walks the inbox page by page, checkpointing the cursor so a stopped run picks up where it left off."""
+
+    @staticmethod
+    def state():
+        conn = sqlite3.connect(Database.DB_FILE)
+        row = conn.execute("SELECT page_url, last_thread, pages_done, threads_saved, status, updated_at FROM backfill_state WHERE id=1").fetchone()
+        conn.close()
+        return dict(zip(["page_url", "last_thread", "pages_done", "threads_saved", "status", "updated_at"], row))
+
+    @staticmethod
+    def checkpoint(**fields):
+        fields["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn = sqlite3.connect(Database.DB_FILE)
+        conn.execute(f"UPDATE backfill_state SET {', '.join(f'{k}=?' for k in fields)} WHERE id=1", list(fields.values()))
+        conn.commit(); conn.close()
+
+    @staticmethod
+    def reset():
+        BackfillJob.checkpoint(page_url=None, last_thread=None, pages_done=0, threads_saved=0, status="idle")
+
+    @staticmethod
+    def request_stop():
+        BackfillJob.checkpoint(status="stopping")
+
+    @staticmethod
+    def stopping():
+        return BackfillJob.state()["status"] == "stopping"
+
+    @staticmethod
+    def run(days=365, pages_per_minute=2, schema=None, on_progress=None):
+        Database.init()
+        schema = schema or Analyzer.DEFAULT_SCHEMA
+        state = BackfillJob.state()
+        if state["status"] == "done": return state
+        if state["status"] == "stopping":
+            # Stop was pressed while the job was still queued.
+            BackfillJob.checkpoint(status="stopped")
+            return BackfillJob.state()
+        cutoff = datetime.now() - timedelta(days=days)
+        min_gap = 60.0 / max(pages_per_minute, 0.01)
+        url, skip_until = state["page_url"] or InboxIndexer.BASE_URL + "/messages/", state["last_thread"]
+        totals = {"pages": state["pages_done"], "saved": state["threads_saved"]}
+        BackfillJob.checkpoint(status="running")
+
+        def flush(batch):
+            saved = Database.save_orders(batch)
+            Analyzer.analyze_batch(saved, schema)
+            totals["saved"] += len(saved)
+            BackfillJob.checkpoint(page_url=url, last_thread=batch[-1]['url'], threads_saved=totals["saved"])
+            batch.clear()
+
+        last_nav = [0.0]
+        def pace():
+            """Keeps every navigation, inbox page or thread, min_gap apart; False once a stop is requested."""
+            while time.time() - last_nav[0] < min_gap:
+                if BackfillJob.stopping(): return False
+                time.sleep(min(1.0, min_gap - (time.time() - last_nav[0])))
+            last_nav[0] = time.time()
+            return not BackfillJob.stopping()
+
+        try:
+            with ScraperBot.session(headless=True) as context:
+                page = context.new_page()
+                while url:
+                    if not pace():
+                        BackfillJob.checkpoint(status="stopped")
+                        return BackfillJob.state()
+                    page.goto(url)
+                    threads = InboxIndexer.read_page(page)
+                    next_url = InboxIndexer.older_link(page)
+                    urls = [t['url'] for t in threads]
+                    if skip_until in urls: threads = threads[urls.index(skip_until) + 1:]
+                    skip_until = None
+
+                    fresh = [t for t in threads if InboxIndexer.parse_date(t['date']) >= cutoff]
+                    if len(fresh) < len(threads): next_url = None
+                    batch, failed = [], []
+                    for item in SafeWorker.iter_details(context, fresh, pace=pace, failed=failed):
+                        batch.append(item)
+                        if len(batch) >= ScraperBot.BATCH_SIZE: flush(batch)
+                    if batch: flush(batch)
+                    # The cursor moves past threads that failed to load, so hand them to the scraper's retry backlog.
+                    if failed: Database.add_backlog([dict(t, attempts=1) for t in failed])
+                    if BackfillJob.stopping():
+                        # Stopped part-way through this page: the cursor still points at it and its last saved thread.
+                        BackfillJob.checkpoint(status="stopped")
+                        return BackfillJob.state()
+
+                    totals["pages"] += 1
+                    url = next_url
+                    BackfillJob.checkpoint(page_url=url, last_thread=None, pages_done=totals["pages"])
+                    if on_progress: on_progress(BackfillJob.state())
+                page.close()
+        except Exception:
+            BackfillJob.checkpoint(status="failed")
+            raise
+        BackfillJob.checkpoint(status="done")
+        return BackfillJob.state()
 
 # ==========================================
 # PART 3: BUSINESS LOGIC
 # ==========================================
 class Analyzer:
+    DEFAULT_SCHEMA = [
+        {"name": "Full Cord", "price": 300, "keywords": "full cord, 1 cord", "reply": "A Full Cord is $300..."},
+        {"name": "Half Cord", "price": 175, "keywords": "half cord, 1/2", "reply": "Half Cord is $175..."}
+    ]
+    TOWNS = ["Longview", "Tyler", "Marshall", "Kilgore", "Gladewater"]
+
+    @staticmethod
+    def analyze(text, schema):
+        prod_name, val, city = "Unsure", 0, "Unknown"
+
+        for item in schema:
+            if any(k.strip().lower() in text.lower() for k in item['keywords'].split(',')):
+                prod_name = item['name']; val = item['price']; break
+
+        for t in Analyzer.TOWNS:
+            if t.lower() in text.lower(): city = t; break
+
+        addr = None
+        match = re.search(r'\d{2,5}\s\w+\s?(?:St|Ave|Rd|Dr|Hwy|Ln|Blvd)\w*', text, re.IGNORECASE)
+        if match: addr = match.group(0) + (f", {city}, TX" if city != "Unknown" else "")
+        return prod_name, val, addr, city
+
+    @staticmethod
+    def analyze_batch(rows, schema):
+        """rows: (id, raw_message) pairs. Writes all results in one transaction."""
+        updates = [(*Analyzer.analyze(text, schema), "Analyzed", order_id) for order_id, text in rows]
+        if updates: Database.update_analysis_many(updates)
+        return len(updates)
+
+    @staticmethod
+    def reprice_all(schema=None, chunk=500, on_progress=None, should_cancel=None):
+        """Re-analyzes every order in id order, committing one chunk at a time.
+
+        on_progress(done, total) runs after each chunk; should_cancel() is checked before the next one, and chunks already committed stay."""
+        schema = schema or Analyzer.DEFAULT_SCHEMA
+        done, last_id = 0, 0
+        conn = sqlite3.connect(Database.DB_FILE)
+        total = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        while not (should_cancel and should_cancel()):
+            rows = conn.execute("SELECT id, raw_message FROM orders WHERE id > ? ORDER BY id LIMIT ?", (last_id, chunk)).fetchall()
+            if not rows: break
+            done += Analyzer.analyze_batch(rows, schema)
+            last_id = rows[-1][0]
+            if on_progress: on_progress(done, total)
+        conn.close()
+        return done
+
     @staticmethod
     def apply_pricing_logic(df, schema):
         for _, row in df.iterrows():
-            text = row['raw_message']
-            prod_name, val, city = "Unsure", 0, "Unknown"
-            
-            for item in schema:
-                if any(k.strip().lower() in text.lower() for k in item['keywords'].split(',')):
-                    prod_name = item['name']; val = item['price']; break
-            
-            towns = ["Longview", "Tyler", "Marshall", "Kilgore", "Gladewater"]
-            for t in towns:
-                if t.lower() in text.lower(): city = t; break
-            
-            addr = None
-            match = re.search(r'\d{2,5}\s\w+\s?(?:St|Ave|Rd|Dr|Hwy|Ln|Blvd)\w*', text, re.IGNORECASE)
-            if match: addr = match.group(0) + (f", {city}, TX" if city != "Unknown" else "")
-            
+            prod_name, val, addr, city = Analyzer.analyze(row['raw_message'], schema)
             Database.update_analysis(row['id'], prod_name, val, addr, city)
 
 # ==========================================
 # PART 4: THE DASHBOARD UI
 # ==========================================
+def order_browser(city, schema):
+    """A city's orders one page at a time in an editable grid; tick rows to delete them or draft replies."""
+    key = f"ob_{city}"
+    cached = lambda name, loader, *args: DataCache.get(Database.DB_FILE, ("orders",), (name, city, *args), loader)
+    f1, f2, f3 = st.columns([3, 2, 1])
+    search = f1.text_input("Search", key=f"{key}_q", placeholder="customer, message, address, product")
+    sort = f2.selectbox("Sort", list(Database.SORTS), key=f"{key}_sort")
+    size = f3.selectbox("Per page", [25, 50, 100], key=f"{key}_size")
+
+    total = cached("order_count", lambda: Database.count_orders(city, search), search)
+    pages = max(1, -(-total // size))
+    if st.session_state.get(f"{key}_page", 1) > pages: st.session_state[f"{key}_page"] = pages
+    page = st.session_state.get(f"{key}_page", 1)
+    df = cached("order_page", lambda: Database.page_orders(city, search, sort, size, (page - 1) * size), search, sort, size, page)
+
+    # Rows are identified by order id, and any change to the rows on screen (filter, sort, page, or a write
+    # to orders) gives the grid a new key, so pending ticks and edits never slide onto other orders.
+    version = DataCache.versions(Database.DB_FILE).get("orders")
+    grid_key = f"{key}_grid_{st.session_state.get(f'{key}_rev', 0)}_{version}_{page}_{size}_{sort}_{search}"
+    view = df.drop(columns=["raw_message"]).set_index("id").assign(select=False)
+    edited = st.data_editor(view, key=grid_key, hide_index=True, use_container_width=True,
+                            column_order=["select", "customer", "date_found", "status", "product", "value", "address", "city"],
+                            disabled=["customer", "date_found"])
+    n1, n2 = st.columns([1, 3])
+    n1.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key=f"{key}_page")
+    n2.caption(f"{total} orders · showing {len(df)}")
+
+    edits = {int(view.index[i]): {k: v for k, v in cols.items() if k in Database.EDITABLE}
+             for i, cols in st.session_state[grid_key]["edited_rows"].items()}
+    edits = {order_id: cols for order_id, cols in edits.items() if cols}
+    selected = df[df["id"].isin(edited.index[edited["select"]])]
+    b1, b2 = st.columns(2)
+    if edits and b1.button(f"💾 Save {len(edits)} edited", key=f"{key}_save"):
+        Database.update_orders(edits)
+        st.session_state[f"{key}_rev"] = st.session_state.get(f"{key}_rev", 0) + 1
+        st.rerun()
+    if not selected.empty and b2.button(f"🗑️ Delete {len(selected)} selected", key=f"{key}_del"):
+        Database.delete_orders(selected["id"].tolist())
+        st.session_state[f"{key}_rev"] = st.session_state.get(f"{key}_rev", 0) + 1
+        st.rerun()
+
+    for _, row in selected.iterrows():
+        with st.expander(f"{row['customer']} - {row['product']} (${row['value']})", expanded=True):
+            st.write(row['raw_message'])
+            tpl = next((p['reply'] for p in schema if p['name'] == row['product']), "Hi!")
+            st.text_area("Draft Reply", tpl, key=f"rp_{row['id']}")
+
+def show_totals(totals):
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Total Revenue", f"${totals['revenue']}")
+    m2.metric("Orders", totals['orders'])
+    m3.metric("Open Value", f"${totals['open']}")
+    m4.metric("Delivered Value", f"${totals['delivered']}")
+
+def latest_job(kind):
+    return DataCache.get(JobQueue.DB_FILE, ("jobs",), ("latest_job", kind), lambda: JobQueue.latest(kind))
+
+def reprice_panel(schema):
+    """The re-price job runs in scan_worker.py; the panel only polls its progress row while one is queued or running."""
+    job = latest_job("reprice")
+    if job and job['status'] in ("queued", "running"): return reprice_progress()
+    if st.button("💲 RE-APPLY PRICING"):
+        JobQueue.enqueue("reprice", {"schema": schema}, dedupe=True)
+        st.rerun()
+    if job: st.caption(f"Last re-price {job['status']} at {job['finished_at']} · {job['progress_done'] or 0:,} / {job['progress_total'] or 0:,} orders")
+
+@fragment(run_every=2)
+def reprice_progress():
+    job = latest_job("reprice")
+    if not job or job['status'] not in ("queued", "running"):
+        # Finished: redraw the page once so the idle panel replaces this polling one.
+        st.rerun()
+    done, total = job['progress_done'] or 0, job['progress_total'] or 0
+    if job['status'] == "queued":
+        st.caption("Re-pricing queued — waiting for a worker (`python scan_worker.py`)")
+    else:
+        elapsed = (datetime.now() - datetime.strptime(job['started_at'], "%Y-%m-%d %H:%M:%S")).total_seconds()
+        rate = done / elapsed if elapsed > 0 else 0
+        st.progress(done / total if total else 0.0, text=f"Re-pricing {done:,} / {total:,} orders · {rate:,.0f} rows/s")
+    if st.button("✖ Cancel re-price", disabled=bool(job['cancel_requested'])):
+        JobQueue.request_cancel(job['id'])
+        st.rerun(scope="fragment")
+
 def main():
     st.set_page_config(layout="wide", page_title="Logistics DB")
-    Database.init()
     st.title("📦 Logistics Command Center")
 
+    # A new session paints the last snapshot before any database work; it is cleared once the live grid has rendered.
+    preview = st.empty()
+    snapshot = Snapshot("orders")
+    if "painted" not in st.session_state:
+        st.session_state.painted = True
+        meta, tables = snapshot.read()
+        if meta:
+            with preview.container():
+                show_totals(meta["totals"])
+                st.caption(" · ".join(f"{r['city'] or 'Unknown'} ({r['orders']})" for r in tables["cities"].to_pylist()))
+                st.caption(f"Snapshot from {meta['written_at']} · loading live data…")
+                st.dataframe(tables["orders"], use_container_width=True, hide_index=True)
+
+    Database.init()
+    JobQueue.init()
+
     st.sidebar.header("Configuration")
     if 'schema' not in st.session_state:
-        st.session_state.schema = [
-            {"name": "Full Cord", "price": 300, "keywords": "full cord, 1 cord", "reply": "A Full Cord is $300..."},
-            {"name": "Half Cord", "price": 175, "keywords": "half cord, 1/2", "reply": "Half Cord is $175..."}
-        ]
+        st.session_state.schema = [dict(p) for p in Analyzer.DEFAULT_SCHEMA]
     
     schema = st.session_state.schema
     for i, p in enumerate(schema):
@@ -190,42 +749,62 @@ def main():
             p['price'] = st.number_input(f"Price", value=p['price'], key=f"p{i}")
             p['reply'] = st.text_area("Reply Template", value=p['reply'], key=f"r{i}")
 
+    cache = DataCache.stats()[-1]
+    st.sidebar.caption(f"⚡ Query cache: {cache['hit_rate']:.0%} hits ({cache['hits']}/{cache['hits'] + cache['misses']})")
+
+    with st.sidebar.expander("📜 History Backfill"):
+        bf = DataCache.get(Database.DB_FILE, ("backfill_state",), "backfill_state", BackfillJob.state)
+        job = latest_job("backfill")
+        running = bool(job and job['status'] in ("queued", "running"))
+        st.caption(f"{bf['status'].upper()} · {bf['pages_done']} pages · {bf['threads_saved']} saved · {bf['updated_at'] or 'never'}")
+        if job and job['status'] == "queued": st.caption("Waiting for a worker (`python scan_worker.py`)")
+        done = bf['status'] == "done"
+        if done: st.success("Backfill reached the cutoff. Reset the cursor to walk the inbox again.")
+        bf_days = st.number_input("Days back", value=365, min_value=1, key="bf_days")
+        bf_rate = st.number_input("Max pages / minute", value=2.0, min_value=0.1, key="bf_rate", help="Inbox pages and threads both count")
+        if not running and not done and st.button("▶️ Start / Resume"):
+            JobQueue.enqueue("backfill", {"days": bf_days, "pages_per_minute": bf_rate, "schema": schema}, dedupe=True)
+            st.rerun()
+        if running and st.button("⏹️ Stop"):
+            BackfillJob.request_stop(); st.rerun()
+        if not running and st.button("↺ Reset Cursor"):
+            BackfillJob.reset(); st.rerun()
+
     c1, c2 = st.columns(2)
     with c1:
         if st.button("⬇️ SCRAPE MESSAGES"):
-            new_data = ScraperBot.run(15, 14)
-            count = 0
-            for item in new_data:
-                if Database.save_order(item['customer'], item['raw_message'], item['date']): count += 1
-            st.success(f"Imported {count} new orders!")
+            bar = st.progress(0.0, text="Opening inbox...")
+            def show(stats):
+                bar.progress(min(stats['fetched'] / 15, 1.0),
+                             text=f"Fetched {stats['fetched']} · Saved {stats['saved']} · Analyzed {stats['analyzed']}")
+            stats = ScraperBot.run(15, 14, schema, on_progress=show)
+            st.success(f"Imported {stats['saved']} new orders!")
+            if stats['remaining']: st.caption(f"Time budget reached · {stats['remaining']} threads queued for the next scrape")
+            if stats['failed']: st.caption(f"{stats['failed']} threads failed to load · retried on the next scrape")
+            st.caption(f"Skipped {stats['net']['requests_saved']} requests · {stats['net']['bytes_saved'] / 1024:.0f} KB served from cache")
 
     with c2:
-        if st.button("💲 RE-APPLY PRICING"):
-            df = Database.fetch_all()
-            Analyzer.apply_pricing_logic(df, schema)
-            st.success("Prices updated!")
-
-    df_db = Database.fetch_all()
-    if not df_db.empty:
-        st.metric("Total Revenue", f"${df_db['value'].sum()}")
-        cities = df_db['city'].unique()
-        tabs = st.tabs([c if c else "Unknown" for c in cities])
-        
-        for city, tab in zip(cities, tabs):
-            with tab:
-                subset = df_db[df_db['city'] == city]
-                addrs = subset[subset['address'].notnull()]['address'].tolist()
-                if addrs:
-                    link = "https://www.google.com/maps/dir/" + "/".join([a.replace(" ", "+") for a in addrs])
-                    st.markdown(f"**[🗺️ ROUTE FOR {city}]({link})**")
-                
-                for _, row in subset.iterrows():
-                    with st.expander(f"{row['customer']} - {row['product']} (${row['value']})"):
-                        st.write(row['raw_message'])
-                        tpl = next((p['reply'] for p in schema if p['name'] == row['product']), "Hi!")
-                        st.text_area("Draft Reply", tpl, key=f"rp_{row['id']}")
-                        if st.button("🗑️ Delete", key=f"del_{row['id']}"):
-                            Database.delete_order(row['id']); st.rerun()
+        reprice_panel(schema)
+
+    totals = DataCache.get(Database.DB_FILE, ("orders",), "order_totals", Database.totals)
+    summary = DataCache.get(Database.DB_FILE, ("orders",), ("order_summary", "city"), lambda: Database.summary("city"))
+    with st.container():
+        if summary:
+            show_totals(totals)
+            # Only the chosen city is queried and rendered; the labels come from the trigger-kept summary.
+            labels = {city: f"{city or 'Unknown'} ({count} · ${revenue:,.0f})" for city, count, revenue in summary}
+            city = st.radio("City", list(labels), format_func=labels.get, horizontal=True, key="city_view", label_visibility="collapsed")
+            addrs = DataCache.get(Database.DB_FILE, ("orders",), ("route", city), lambda: Database.city_addresses(city))
+            if addrs:
+                link = "https://www.google.com/maps/dir/" + "/".join([a.replace(" ", "+") for a in addrs])
+                st.markdown(f"**[🗺️ ROUTE FOR {city or 'Unknown'}]({link})**")
+            order_browser(city, schema)
+    preview.empty()
+
+    snapshot.refresh(DataCache.versions(Database.DB_FILE).get("orders"), lambda: (
+        {"cities": pd.DataFrame(summary, columns=["city", "orders", "revenue"]),
+         "orders": Database.page_orders(Database.ALL_CITIES, limit=25).drop(columns=["raw_message"])},
+        {"totals": totals}))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,124 @@
+import os
+import codecs
+import argparse
+import binascii
+from collections import deque
+from email.parser import BytesParser
+from email.policy import default as email_policy
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from page_archive import TextExtractor, Extractors
+
+# ==========================================
+# PART 1: STREAMING SNAPSHOT READER
+# ==========================================
+class MhtmlReader:
+    """Reads a saved .mhtml page line by line and streams the main HTML frame through the text extractor."""
+    MAX_LINE = 1 << 20
+    # Only text inside this element is read, as SafeWorker does with Extractors.thread; the rest is page chrome.
+    CONTAINER = ("id", "root")
+
+    def __init__(self, path, container=None):
+        self.path = path
+        self.container = container or MhtmlReader.CONTAINER
+        self.headers = None
+
+    def _headers(self, f):
+        block = b""
+        while True:
+            line = f.readline(MhtmlReader.MAX_LINE)
+            if not line or line in (b"\r\n", b"\n"): break
+            block += line
+        return BytesParser(policy=email_policy).parsebytes(block + b"\r\n", headersonly=True)
+
+    def lines(self):
+        """Yields the visible text lines inside the container of the first text/html part, in document order."""
+        with open(self.path, "rb") as f:
+            self.headers = self._headers(f)
+            boundary = self.headers.get_boundary()
+            if not boundary: return
+            marker = b"--" + boundary.encode()
+
+            line = f.readline(MhtmlReader.MAX_LINE)
+            while line and not line.startswith(marker): line = f.readline(MhtmlReader.MAX_LINE)
+            while line and not line.rstrip().endswith(marker + b"--"):
+                part = self._headers(f)
+                if part.get_content_type() != "text/html":
+                    line = f.readline(MhtmlReader.MAX_LINE)
+                    while line and not line.startswith(marker): line = f.readline(MhtmlReader.MAX_LINE)
+                    continue
+
+                out = []
+                parser = TextExtractor(*self.container, on_line=out.append)
+                decoder = codecs.getincrementaldecoder(part.get_content_charset() or "utf-8")(errors="replace")
+                encoding = (part.get("Content-Transfer-Encoding") or "8bit").lower()
+                line = f.readline(MhtmlReader.MAX_LINE)
+                while line and not line.startswith(marker):
+                    if encoding == "quoted-printable": chunk = binascii.a2b_qp(line)
+                    elif encoding == "base64": chunk = binascii.a2b_base64(line)
+                    else: chunk = line
+                    parser.feed(decoder.decode(chunk))
+                    yield from out
+                    out.clear()
+                    line = f.readline(MhtmlReader.MAX_LINE)
+                parser.feed(decoder.decode(b"", final=True))
+                parser.close()
+                yield from out
+                return
+
+    def meta(self):
+        h = self.headers
+        subject = str(h.get("Subject") or "").split(" | ")[0].strip() or os.path.splitext(os.path.basename(self.path))[0]
+        try: date = parsedate_to_datetime(h.get("Date")).strftime("%b %d, %Y")
+        except (TypeError, ValueError): date = "Unknown"
+        return {"customer": subject, "date": date, "url": str(h.get("Snapshot-Content-Location") or f"mhtml:{os.path.basename(self.path)}")}
+
+# ==========================================
+# PART 2: INGEST
+# ==========================================
+def read_snapshot(path, container=None):
+    """SafeWorker-shaped result for one snapshot; only the last lines are ever held."""
+    reader = MhtmlReader(path, container)
+    tail = deque(maxlen=10)
+    for line in reader.lines():
+        if len(line) > 10: tail.append(line)
+    if reader.headers is None: return None
+    return dict(reader.meta(), raw_message=Extractors.clean_thread_text("\n".join(tail)))
+
+def snapshot_paths(target):
+    if os.path.isfile(target): return [target]
+    return sorted(os.path.join(d, f) for d, _, files in os.walk(target) for f in files if f.lower().endswith((".mhtml", ".mht")))
+
+def ingest(target, workers=None, schema=None, on_progress=None, container=None):
+    import logistics_db
+    logistics_db.Database.init()
+    schema = schema or logistics_db.Analyzer.DEFAULT_SCHEMA
+    stats = {"files": 0, "saved": 0, "analyzed": 0}
+    batch = []
+
+    def flush():
+        saved = logistics_db.Database.save_orders(batch)
+        batch.clear()
+        stats["saved"] += len(saved)
+        stats["analyzed"] += logistics_db.Analyzer.analyze_batch(saved, schema)
+        if on_progress: on_progress(dict(stats))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        files = snapshot_paths(target)
+        for item in pool.map(read_snapshot, files, [container] * len(files)):
+            stats["files"] += 1
+            if item and item["raw_message"]: batch.append(item)
+            if len(batch) >= logistics_db.ScraperBot.BATCH_SIZE: flush()
+    if batch: flush()
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest saved .mhtml conversation snapshots as orders.")
+    parser.add_argument("target", help="An .mhtml file or a directory of them")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--container", default="=".join(MhtmlReader.CONTAINER), metavar="ATTR=VALUE",
+                        help="Element holding the messages (default: %(default)s; saved Gemini chats: data-test-id=chat-history-container)")
+    args = parser.parse_args()
+    stats = ingest(args.target, args.workers, container=tuple(args.container.split("=", 1)))
+    print(f"Read {stats['files']} snapshots → {stats['saved']} new orders ({stats['analyzed']} analyzed).")
@@ -0,0 +1,253 @@
+import os
+import gzip
+import json
+import sqlite3
+import hashlib
+import argparse
+import datetime
+from html.parser import HTMLParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# ==========================================
+# PART 1: HTML TEXT EXTRACTION
+# ==========================================
+class TextExtractor(HTMLParser):
+    """Approximates Playwright's inner_text for every element matching attr=value (or the whole document)."""
+    SKIP = {"script", "style", "head", "noscript", "template", "svg", "title"}
+    BLOCK = {"div", "p", "br", "tr", "li", "ul", "ol", "table", "section", "article", "header", "footer",
+             "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "form", "main", "nav", "hr"}
+    VOID = {"br", "img", "input", "meta", "link", "hr", "area", "base", "col", "embed", "source", "track", "wbr"}
+
+    def __init__(self, attr=None, value=None, on_line=None):
+        super().__init__(convert_charrefs=True)
+        self.attr, self.value, self.on_line = attr, value, on_line
+        self.stack = []
+        self.skip_depth = None
+        self.match_depth = None if attr else 0
+        self.parts = []
+        self.results = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.BLOCK: self._break()
+        if tag in self.VOID: return
+        self.stack.append(tag)
+        if self.skip_depth is None and tag in self.SKIP: self.skip_depth = len(self.stack)
+        if self.match_depth is None and self.attr and dict(attrs).get(self.attr) == self.value:
+            self.match_depth = len(self.stack)
+            self.parts = []
+
+    def handle_endtag(self, tag):
+        if tag in self.BLOCK: self._break()
+        if tag not in self.stack: return
+        while self.stack:
+            if self.skip_depth == len(self.stack): self.skip_depth = None
+            if self.attr and self.match_depth == len(self.stack):
+                if self.on_line: self._break()
+                else: self.results.append(self._text())
+                self.match_depth = None
+            if self.stack.pop() == tag: break
+
+    def handle_data(self, data):
+        if self.match_depth is not None and self.skip_depth is None: self.parts.append(data)
+
+    def _break(self):
+        """Ends the current line; in streaming mode completed lines go to on_line instead of piling up."""
+        if not self.on_line: return self.parts.append("\n")
+        text = self._text()
+        if text:
+            for line in text.split("\n"): self.on_line(line)
+
+    def close(self):
+        super().close()
+        if self.on_line: self._break()
+
+    def _text(self):
+        lines = (" ".join(l.split()) for l in "".join(self.parts).split("\n"))
+        self.parts = []
+        return "\n".join(l for l in lines if l)
+
+    @staticmethod
+    def extract(html, attr=None, value=None):
+        parser = TextExtractor(attr, value)
+        parser.feed(html)
+        parser.close()
+        if not attr: return [parser._text()]
+        if parser.match_depth is not None: parser.results.append(parser._text())
+        return parser.results
+
+class Extractors:
+    """The parsers shared by the live scrapers and the offline reprocessor.
+
+    Live scrapers archive page.content() and parse that same HTML here, so reprocessing an archived page
+    gives exactly what the live run saw."""
+    @staticmethod
+    def clean_thread_text(raw_text):
+        lines = [l for l in raw_text.split('\n') if len(l) > 10]
+        return " || ".join(lines[-10:])
+
+    @staticmethod
+    def thread(html):
+        root = TextExtractor.extract(html, "id", "root")
+        return Extractors.clean_thread_text(root[0]) if root else ""
+
+    @staticmethod
+    def chat_rows(html):
+        return TextExtractor.extract(html, "role", "row")
+
+# ==========================================
+# PART 2: CONTENT-ADDRESSED STORE
+# ==========================================
+class PageArchive:
+    """Raw pages kept for reprocessing; the oldest fetches are dropped once the objects pass QUOTA_MB."""
+    ROOT = "page_archive"
+    ENABLED = True
+    QUOTA_MB = 500
+    # store() checks the quota every this many pages rather than on every write.
+    PRUNE_EVERY = 100
+    _stored = 0
+
+    @staticmethod
+    def connect():
+        os.makedirs(os.path.join(PageArchive.ROOT, "objects"), exist_ok=True)
+        conn = sqlite3.connect(os.path.join(PageArchive.ROOT, "index.db"))
+        conn.execute('''CREATE TABLE IF NOT EXISTS pages
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         digest TEXT, url TEXT, source TEXT,
+                         fetched_at TEXT, meta JSON)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS pages_url ON pages (url, fetched_at)")
+        try: conn.execute("ALTER TABLE pages ADD COLUMN size INTEGER")
+        except sqlite3.OperationalError: pass
+        return conn
+
+    @staticmethod
+    def path(digest):
+        return os.path.join(PageArchive.ROOT, "objects", digest[:2], digest[2:] + ".html.gz")
+
+    @staticmethod
+    def store(url, html, source, meta=None):
+        """Saves the page body once per unique digest and records this fetch in the index."""
+        if not PageArchive.ENABLED: return None
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = PageArchive.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + f".{os.getpid()}.tmp"
+            with gzip.open(tmp, "wb", compresslevel=6) as f: f.write(data)
+            os.replace(tmp, path)
+        conn = PageArchive.connect()
+        conn.execute("INSERT INTO pages (digest, url, source, fetched_at, meta, size) VALUES (?, ?, ?, ?, ?, ?)",
+                     (digest, url, source, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), json.dumps(meta or {}),
+                      os.path.getsize(path)))
+        conn.commit(); conn.close()
+        PageArchive._stored += 1
+        if PageArchive._stored % PageArchive.PRUNE_EVERY == 0: PageArchive.prune()
+        return digest
+
+    @staticmethod
+    def prune():
+        """Deletes the oldest fetches until the objects fit in QUOTA_MB; an object goes once no fetch refers to it."""
+        conn = PageArchive.connect()
+        # Rows archived before sizes were recorded.
+        for digest, in conn.execute("SELECT DISTINCT digest FROM pages WHERE size IS NULL").fetchall():
+            try: size = os.path.getsize(PageArchive.path(digest))
+            except OSError: size = 0
+            conn.execute("UPDATE pages SET size=? WHERE digest=?", (size, digest))
+        sizes = dict(conn.execute("SELECT digest, MAX(size) FROM pages GROUP BY digest"))
+        total, quota = sum(sizes.values()), PageArchive.QUOTA_MB * 1024 * 1024
+        doomed = []
+        if total > quota:
+            refs = Counter(d for d, in conn.execute("SELECT digest FROM pages"))
+            # Always keep the newest fetch, even if it alone is over quota.
+            for row_id, digest in conn.execute("SELECT id, digest FROM pages WHERE id < (SELECT MAX(id) FROM pages) ORDER BY id").fetchall():
+                if total <= quota: break
+                conn.execute("DELETE FROM pages WHERE id=?", (row_id,))
+                refs[digest] -= 1
+                if refs[digest] == 0:
+                    doomed.append(PageArchive.path(digest))
+                    total -= sizes[digest]
+        conn.commit(); conn.close()
+        # Files go only after the index stops pointing at them.
+        for path in doomed:
+            try: os.remove(path)
+            except OSError: pass
+        return len(doomed)
+
+    @staticmethod
+    def distinct(source):
+        """Every distinct page body for one source, oldest first, each with the time it was first fetched.
+
+        For pages that always come from one URL (the chat list), where latest() would keep only the last scan."""
+        conn = PageArchive.connect()
+        rows = conn.execute('''SELECT url, digest, MIN(fetched_at), meta FROM pages WHERE source=?
+                               GROUP BY digest ORDER BY MIN(id)''', (source,)).fetchall()
+        conn.close()
+        return [{"url": u, "digest": d, "fetched_at": t, "meta": json.loads(m or "{}")} for u, d, t, m in rows]
+
+    @staticmethod
+    def load(digest):
+        with gzip.open(PageArchive.path(digest), "rb") as f: return f.read().decode("utf-8")
+
+    @staticmethod
+    def latest(source):
+        """Newest fetch of every URL for one source."""
+        conn = PageArchive.connect()
+        rows = conn.execute('''SELECT url, digest, fetched_at, meta FROM pages
+                               WHERE id IN (SELECT MAX(id) FROM pages WHERE source=? GROUP BY url)
+                               ORDER BY id''', (source,)).fetchall()
+        conn.close()
+        return [{"url": u, "digest": d, "fetched_at": t, "meta": json.loads(m or "{}")} for u, d, t, m in rows]
+
+# ==========================================
+# PART 3: OFFLINE REPROCESSING
+# ==========================================
+def _extract(entry):
+    html = PageArchive.load(entry["digest"])
+    if entry["source"] == "thread": return entry, Extractors.thread(html)
+    return entry, Extractors.chat_rows(html)
+
+def reprocess(sources=("thread", "chatlist"), workers=None):
+    """Re-runs the current extractors over the archive and writes the results back; no network involved."""
+    import logistics_db
+    import logistics_box
+    logistics_db.Database.init()
+    logistics_box.Database.init()
+
+    totals = {}
+    watch_words = logistics_box.Database.watchlist()
+    for source in sources:
+        # A thread's newest fetch supersedes older ones; every chat-list snapshot may hold rows no other one has.
+        fetches = PageArchive.latest(source) if source == "thread" else PageArchive.distinct(source)
+        entries = [dict(e, source=source) for e in fetches]
+        done, written, batch = 0, 0, []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for entry, result in pool.map(_extract, entries, chunksize=16):
+                done += 1
+                if source == "thread":
+                    if result: batch.append({"customer": entry["meta"].get("name", "Unknown"), "raw_message": result,
+                                             "date": entry["meta"].get("date", entry["fetched_at"]), "url": entry["url"]})
+                    if len(batch) >= 200:
+                        written += logistics_db.Analyzer.analyze_batch(logistics_db.Database.refresh_orders(batch), logistics_db.Analyzer.DEFAULT_SCHEMA)
+                        batch = []
+                else:
+                    # Dated when the page was fetched, so old snapshots land in the right rollup buckets.
+                    written += logistics_box.PassiveScanner.log_matches(result, watch_words, entry["fetched_at"][:16])
+        if batch:
+            written += logistics_db.Analyzer.analyze_batch(logistics_db.Database.refresh_orders(batch), logistics_db.Analyzer.DEFAULT_SCHEMA)
+        totals[source] = {"pages": done, "written": written}
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raw page archive tools.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("reprocess", help="Run the current extractors over every archived page")
+    rp.add_argument("--source", choices=["thread", "chatlist"], action="append", help="Limit to one page type (repeatable)")
+    rp.add_argument("--workers", type=int, default=None, help="Extractor processes (default: CPU count)")
+    sub.add_parser("prune", help=f"Delete the oldest pages until the archive fits in {PageArchive.QUOTA_MB} MB")
+    args = parser.parse_args()
+    if args.cmd == "prune":
+        print(f"{PageArchive.prune()} pages deleted")
+        raise SystemExit(0)
+    for source, t in reprocess(tuple(args.source or ("thread", "chatlist")), args.workers).items():
+        print(f"{source}: {t['pages']} pages reprocessed, {t['written']} rows written")
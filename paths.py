@@ -0,0 +1,25 @@
+import os
+
+# ==========================================
+# ON-DISK LOCATIONS
+# ==========================================
+# The dashboards, scan_worker.py and the tools share these files; each class copies its path into DB_FILE at import.
+ORDERS_DB = "logistics.db"
+DEEP_DB = "logistics_deep.db"
+
+def relocate(workdir):
+    """Points every database and artifact directory under workdir, so a bench or test run touches nothing real."""
+    import logistics_db
+    import logistics_box
+    from job_queue import JobQueue
+    from run_history import RunHistory
+    from page_archive import PageArchive
+    from browser_kit import TraceRecorder
+    from snapshot import Snapshot
+
+    logistics_db.Database.DB_FILE = os.path.join(workdir, ORDERS_DB)
+    logistics_box.Database.DB_FILE = JobQueue.DB_FILE = RunHistory.DB_FILE = os.path.join(workdir, DEEP_DB)
+    PageArchive.ROOT = os.path.join(workdir, "page_archive")
+    TraceRecorder.ROOT = os.path.join(workdir, "traces")
+    Snapshot.ROOT = os.path.join(workdir, "snapshots")
+    return logistics_db, logistics_box
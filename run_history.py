@@ -0,0 +1,127 @@
+import time
+import sqlite3
+import datetime
+import paths
+from collections import Counter
+from contextlib import contextmanager
+
+# ==========================================
+# SCAN RUN HISTORY
+# ==========================================
+class RunHistory:
+    """One scan_runs row per PassiveScanner.run_scan / ScraperBot.run, with per-stage timings."""
+    DB_FILE = paths.DEEP_DB
+    STAGES = ("launch", "nav", "extract", "match")
+    COUNTERS = ("rows_seen", "matches", "inserts", "errors")
+    COLUMNS = ["id", "kind", "started_at", "ended_at", "duration", *(f"{s}_s" for s in STAGES), *COUNTERS, "error"]
+
+    @staticmethod
+    def init():
+        conn = sqlite3.connect(RunHistory.DB_FILE)
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS scan_runs
+                         (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          kind TEXT, started_at TEXT, ended_at TEXT, duration REAL,
+                          {", ".join(f"{s}_s REAL" for s in RunHistory.STAGES)},
+                          {", ".join(f"{c} INTEGER" for c in RunHistory.COUNTERS)},
+                          error TEXT)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS scan_runs_kind ON scan_runs (kind, id)")
+        conn.commit(); conn.close()
+
+    @staticmethod
+    def record(row):
+        RunHistory.init()
+        cols = [c for c in RunHistory.COLUMNS if c != "id"]
+        conn = sqlite3.connect(RunHistory.DB_FILE)
+        conn.execute(f"INSERT INTO scan_runs ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", [row.get(c) for c in cols])
+        conn.commit(); conn.close()
+
+    @staticmethod
+    def recent(limit=200, kind=None):
+        RunHistory.init()
+        conn = sqlite3.connect(RunHistory.DB_FILE)
+        where, args = ("WHERE kind=?", [kind]) if kind else ("", [])
+        rows = conn.execute(f"SELECT * FROM scan_runs {where} ORDER BY id DESC LIMIT ?", [*args, limit]).fetchall()
+        conn.close()
+        return [dict(zip(RunHistory.COLUMNS, r)) for r in reversed(rows)]
+
+    @staticmethod
+    def percentiles(kind, window=100, points=(50, 95)):
+        """Nearest-rank percentiles of duration over the last `window` finished runs of one kind."""
+        durations = sorted(r["duration"] for r in RunHistory.recent(window, kind) if r["duration"] is not None)
+        if not durations: return {p: None for p in points}
+        return {p: durations[min(len(durations) - 1, max(0, -(-p * len(durations) // 100) - 1))] for p in points}
+
+class RunTimer:
+    """Accumulates stage timings and counters for one run; save() writes them. kind=None records nothing."""
+    def __init__(self, kind=None):
+        self.kind = kind
+        self.started = time.time()
+        self.stages = Counter()
+        self.counts = Counter()
+        self.error = None
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try: yield
+        finally: self.stages[name] += time.perf_counter() - t0
+
+    def count(self, **counters):
+        self.counts.update(counters)
+
+    def fail(self, exc):
+        self.error = f"{type(exc).__name__}: {exc}"
+        self.counts["errors"] += 1
+
+    def row(self):
+        ended = time.time()
+        fmt = lambda t: datetime.datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+        row = {"kind": self.kind, "started_at": fmt(self.started), "ended_at": fmt(ended), "duration": ended - self.started, "error": self.error}
+        row.update({f"{s}_s": self.stages[s] for s in RunHistory.STAGES})
+        row.update({c: self.counts[c] for c in RunHistory.COUNTERS})
+        return row
+
+    def save(self):
+        if not self.kind: return None
+        row = self.row()
+        RunHistory.record(row)
+        return row
+
+# ==========================================
+# RUN BUDGETS
+# ==========================================
+class ScanBudget:
+    """Wall-clock and page-load limits for one run. None means unlimited."""
+    def __init__(self, seconds=None, pages=None):
+        self.seconds, self.pages = seconds, pages
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.pages_used = 0
+        self.parent = None
+
+    def remaining(self):
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def timeout_ms(self, cap_ms):
+        """A Playwright timeout that never runs past the deadline (1 ms at the least: 0 would mean no timeout)."""
+        left = self.remaining()
+        return cap_ms if left is None else max(1, min(cap_ms, int(left * 1000)))
+
+    def exhausted(self):
+        if self.parent is not None and self.parent.exhausted(): return True
+        if self.pages is not None and self.pages_used >= self.pages: return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def take_page(self):
+        if self.exhausted(): return False
+        self.pages_used += 1
+        if self.parent is not None: self.parent.take_page()
+        return True
+
+    def portion(self, fraction):
+        """A budget for one phase of the run: at most fraction of the time and pages left. Its pages count here too."""
+        left = self.remaining()
+        pages_left = None if self.pages is None else max(self.pages - self.pages_used, 0)
+        part = ScanBudget(None if left is None else left * fraction,
+                          None if pages_left is None else min(pages_left, max(1, int(pages_left * fraction))))
+        part.parent = self
+        return part
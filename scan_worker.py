@@ -0,0 +1,139 @@
+import os
+import csv
+import time
+import sqlite3
+import logging
+import argparse
+import datetime
+import threading
+import traceback
+
+from job_queue import JobQueue
+from browser_kit import BrowserWorker
+
+logger = logging.getLogger("ScanWorker")
+
+# One Chromium kept warm for the life of this process; see browser_kit.BrowserWorker.
+BROWSER = None
+
+# ==========================================
+# PART 1: JOB HANDLERS
+# ==========================================
+def run_scan(params, job):
+    import logistics_box
+    from run_history import ScanBudget
+    global BROWSER
+    if BROWSER is None: BROWSER = BrowserWorker()
+    started = time.perf_counter()
+    # Runs on the browser's own thread; backfill keeps opening one-off sessions on this one.
+    new_leads = BROWSER.call(logistics_box.PassiveScanner.run_scan, ScanBudget(params.get("budget_s")), BROWSER,
+                             timeout=(params.get("budget_s") or 0) + BROWSER.hang_seconds)
+    # A scan that raised never gets here, and one that could not run returns None: neither says the inbox
+    # was quiet, so only a completed scan moves the learned interval.
+    if new_leads is None: return {"new_leads": None, "skipped": True}
+    next_interval = logistics_box.AdaptiveInterval.record(new_leads, time.perf_counter() - started)
+    return {"new_leads": new_leads, "adaptive_interval": round(next_interval), "browser": BROWSER.stats()}
+
+def run_backfill(params, job):
+    import logistics_db
+    state = logistics_db.BackfillJob.run(params.get("days", 365), params.get("pages_per_minute", 2), params.get("schema"))
+    return {k: state[k] for k in ("status", "pages_done", "threads_saved")}
+
+def run_reprice(params, job):
+    """Reports progress on the job row after every chunk and stops when the dashboard asks it to."""
+    import logistics_db
+    rows = logistics_db.Analyzer.reprice_all(params.get("schema"),
+                                             on_progress=lambda done, total: JobQueue.progress(job["id"], done, total),
+                                             should_cancel=lambda: JobQueue.cancel_requested(job["id"]))
+    return {"rows": rows, "cancelled": JobQueue.cancel_requested(job["id"])}
+
+def run_export(params, job):
+    """Streams one table to CSV without loading it into memory."""
+    import logistics_db
+    import logistics_box
+    table = params.get("table", "orders")
+    db_file = {"orders": logistics_db.Database.DB_FILE, "deep_logs": logistics_box.Database.DB_FILE}[table]
+    os.makedirs("exports", exist_ok=True)
+    path = params.get("path") or os.path.join("exports", f"{table}_{datetime.datetime.now():%Y%m%d_%H%M%S}.csv")
+    conn = sqlite3.connect(db_file)
+    cur = conn.execute(f"SELECT * FROM {table} ORDER BY id")
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([d[0] for d in cur.description])
+        for row in cur:
+            writer.writerow(row)
+            rows += 1
+    conn.close()
+    return {"path": path, "rows": rows}
+
+HANDLERS = {"scan": run_scan, "backfill": run_backfill, "reprice": run_reprice, "export": run_export}
+# Kinds in different lanes never wait behind each other: a backfill paced over hours must not hold up scheduled scans.
+LANES = (("scan",), ("backfill",), ("reprice", "export"))
+
+# ==========================================
+# PART 2: WORKER LOOP
+# ==========================================
+def work_one(job):
+    started = time.perf_counter()
+    logger.info(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} started")
+    try:
+        result = HANDLERS[job["kind"]](job["params"], job)
+    except Exception as e:
+        JobQueue.fail(job["id"], f"{e}\n{traceback.format_exc(limit=5)}", time.perf_counter() - started)
+        logger.error(f"Job {job['id']} ({job['kind']}) failed: {e}")
+        return False
+    JobQueue.finish(job["id"], result, time.perf_counter() - started, "cancelled" if result.get("cancelled") else "done")
+    logger.info(f"Job {job['id']} ({job['kind']}) done in {time.perf_counter() - started:.1f}s: {result}")
+    return True
+
+def serve(kinds=None, poll=1.0, once=False):
+    JobQueue.init()
+    worker = JobQueue.worker_id()
+    if JobQueue.recover(): logger.info("Requeued jobs left running by a dead worker")
+    # Only look for work when the database has changed (or every IDLE_RECHECK seconds as a fallback).
+    watch = sqlite3.connect(JobQueue.DB_FILE)
+    seen, last_check = None, 0.0
+    logger.info(f"Worker {worker} waiting for {', '.join(kinds or JobQueue.KINDS)} jobs")
+    while True:
+        version = watch.execute("PRAGMA data_version").fetchone()[0]
+        if version != seen or time.time() - last_check > 30:
+            seen, last_check = version, time.time()
+            job = JobQueue.claim(worker, kinds)
+            if job:
+                work_one(job)
+                seen = None
+                continue
+            if once: return
+        time.sleep(poll)
+
+def serve_lanes(kinds=None, poll=1.0, once=False):
+    """One serve() loop per lane on its own thread, limited to kinds when given."""
+    lanes = [lane for lane in (tuple(k for k in lane if not kinds or k in kinds) for lane in LANES) if lane]
+    if len(lanes) == 1: return serve(lanes[0], poll, once)
+    threads = [threading.Thread(target=serve, args=(lane, poll, once), name=f"lane-{'+'.join(lane)}", daemon=True) for lane in lanes]
+    for t in threads: t.start()
+    # Joined with a timeout so Ctrl+C still reaches the main thread.
+    while any(t.is_alive() for t in threads):
+        for t in threads: t.join(0.5)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description="Runs scan/backfill/reprice/export jobs queued by the dashboards.")
+    parser.add_argument("--kinds", nargs="+", choices=JobQueue.KINDS,
+                        help="Only claim these job kinds (default: all, with scans, backfill and reprice/export in separate lanes)")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds between queue checks while idle")
+    parser.add_argument("--once", action="store_true", help="Drain the queue and exit")
+    parser.add_argument("--scheduler", action="store_true", help="Also run the HunterLoop here (the scheduler lease keeps it single)")
+    parser.add_argument("--browser-max-mb", type=int, help=f"Recycle the warm browser above this RSS (default {BrowserWorker.MAX_RSS_MB})")
+    parser.add_argument("--browser-max-pages", type=int, help=f"Recycle the warm browser after this many pages (default {BrowserWorker.MAX_PAGES})")
+    args = parser.parse_args()
+    BROWSER = BrowserWorker(max_rss_mb=args.browser_max_mb, max_pages=args.browser_max_pages)
+    if args.scheduler:
+        import logistics_box
+        logistics_box.Database.init()
+        logistics_box.Scheduler.start()
+    try: serve_lanes(args.kinds, args.poll, args.once)
+    except KeyboardInterrupt: pass
+    finally:
+        if BROWSER is not None: BROWSER.stop()
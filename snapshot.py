@@ -0,0 +1,69 @@
+import os
+import json
+import tempfile
+import datetime
+
+# ==========================================
+# FIRST-PAINT SNAPSHOTS
+# ==========================================
+class Snapshot:
+    """The last summary a dashboard rendered, kept in one Arrow IPC file so a cold start can paint before any query.
+
+    Each table is stored as its own IPC stream inside a (name, payload) table, so the whole snapshot is
+    replaced with a single os.replace and read back through a memory map without copying the payloads."""
+    ROOT = "snapshots"
+    ENABLED = True
+    # path -> stamp of the data last written, so an unchanged dashboard never rewrites the file.
+    _written = {}
+
+    def __init__(self, name):
+        self.path = os.path.join(Snapshot.ROOT, f"{name}.arrow")
+
+    def read(self):
+        """(meta, {name: pyarrow.Table}), or (None, {}) when there is no usable snapshot."""
+        if not Snapshot.ENABLED or not os.path.exists(self.path): return None, {}
+        import pyarrow as pa
+        import pyarrow.ipc
+        try:
+            outer = pa.ipc.open_file(pa.memory_map(self.path, "r")).read_all()
+            meta = json.loads(outer.schema.metadata[b"meta"])
+            tables = {name: pa.ipc.open_stream(payload.as_buffer()).read_all()
+                      for name, payload in zip(outer.column("name").to_pylist(), outer.column("payload"))}
+        except (OSError, KeyError, ValueError, pa.ArrowException):
+            return None, {}
+        Snapshot._written.setdefault(self.path, meta.get("stamp"))
+        return meta, tables
+
+    def write(self, tables, meta):
+        """tables: {name: DataFrame or pyarrow.Table}; meta: JSON-able dict. Readers see the old file or the new one, never half of one."""
+        import pyarrow as pa
+        import pyarrow.ipc
+        names, payloads = [], []
+        for name, table in tables.items():
+            if not isinstance(table, pa.Table): table = pa.Table.from_pandas(table, preserve_index=False)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer: writer.write_table(table)
+            names.append(name)
+            payloads.append(sink.getvalue().to_pybytes())
+        meta = dict(meta, written_at=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        outer = pa.table({"name": names, "payload": pa.array(payloads, pa.large_binary())}).replace_schema_metadata(
+            {"meta": json.dumps(meta, default=str)})
+
+        os.makedirs(Snapshot.ROOT, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=Snapshot.ROOT, suffix=".tmp")
+        os.close(fd)
+        try:
+            with pa.OSFile(tmp, "wb") as f, pa.ipc.new_file(f, outer.schema) as writer: writer.write_table(outer)
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp): os.unlink(tmp)
+        Snapshot._written[self.path] = meta.get("stamp")
+
+    def refresh(self, stamp, build):
+        """Rewrites the snapshot only when stamp differs from the one on disk; build() -> (tables, meta)."""
+        if not Snapshot.ENABLED: return False
+        if self.path not in Snapshot._written: self.read()
+        if Snapshot._written.get(self.path) == stamp: return False
+        tables, meta = build()
+        self.write(tables, dict(meta, stamp=stamp))
+        return True
@@ -0,0 +1,70 @@
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+# ==========================================
+# COLD-START REPORT
+# ==========================================
+# Entry point -> import budget in milliseconds (cumulative, as reported by -X importtime). Enforced only by
+# --check on a known machine; the test suite checks HEAVY alone, since absolute timings vary across CI hosts.
+BUDGETS = {
+    "logistics_db": 120,
+    "logistics_box": 120,
+    "scan_worker": 60,
+    "backfill": 120,
+    "dyi_import": 150,
+    "mhtml_ingest": 100,
+    "page_archive": 80,
+    "fixture_inbox": 80,
+}
+# Nothing should pull these in just by being imported; they load on first use.
+HEAVY = ("streamlit", "pandas", "playwright", "pyarrow")
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def measure(module):
+    """Imports module in a fresh interpreter; returns (cumulative ms, wall ms, heavy packages it loaded)."""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    wall = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    cumulative, heavy = None, set()
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if not m: continue
+        name = m.group(4)
+        if name.split(".")[0] in HEAVY: heavy.add(name.split(".")[0])
+        if name == module and len(m.group(3)) == 1: cumulative = int(m.group(2)) / 1000
+    return cumulative, wall, sorted(heavy)
+
+def report(modules, repeat=3):
+    """Best of `repeat` runs per entry point, so one slow disk read does not count as a regression."""
+    rows = []
+    for module in modules:
+        runs = [measure(module) for _ in range(repeat)]
+        cumulative = min(r[0] for r in runs)
+        wall = min(r[1] for r in runs)
+        rows.append({"module": module, "import_ms": cumulative, "wall_ms": wall, "budget_ms": BUDGETS.get(module),
+                     "heavy": runs[0][2]})
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of each entry point against its budget.")
+    parser.add_argument("modules", nargs="*", help=f"Entry points to measure (default: {', '.join(BUDGETS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per entry point; the fastest counts")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any entry point is over budget or imports a heavy package")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'entry point':<16}{'import':>10}{'wall':>10}{'budget':>10}  heavy imports")
+    for row in report(args.modules or list(BUDGETS), args.repeat):
+        over = row["budget_ms"] is not None and row["import_ms"] > row["budget_ms"]
+        bad = over or bool(row["heavy"])
+        failed |= bad
+        print(f"{row['module']:<16}{row['import_ms']:>8.0f}ms{row['wall_ms']:>8.0f}ms{row['budget_ms'] or 0:>8}ms  "
+              f"{', '.join(row['heavy']) or '-'}{'  << OVER' if bad else ''}")
+    sys.exit(1 if args.check and failed else 0)
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import startup_report
+
+@pytest.mark.parametrize("module", list(startup_report.BUDGETS))
+def test_entry_point_imports_no_heavy_package(module):
+    """Importing an entry point pulls in none of the heavy packages; the ms budgets stay in startup_report.py."""
+    _, _, heavy = startup_report.measure(module)
+    assert not heavy, f"import {module} loaded {', '.join(heavy)}"